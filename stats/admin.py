@@ -1,16 +1,19 @@
+import time
 from functools import partialmethod
 
-import pyocr
+from django.conf import settings
 from django.contrib import admin, messages
 from django.http import HttpResponseRedirect
 from django.urls import path
+from django.utils.html import format_html, format_html_join
 from django.template.response import TemplateResponse
 from django.urls import reverse
 
 from .forms import PlayerInlineAdminForm, PrefillForm, BulkImportForm, GameAdminForm, PokemonChoiceField, \
      DBFieldModelChoiceField
-from .models import Game, PlayerStat, Teammate, Pokemon, Season
-from .utils import prefill_game, bulk_import
+from . import jobs, ocr, rollups
+from .models import Game, ImportJob, PlayerStat, Teammate, TeammateAlias, Pokemon, PokemonAlias, Season
+from .utils import prefill_game, update_fingerprints, update_mvp
 
 admin.AdminSite.site_header = "Données du FCS"
 
@@ -163,37 +166,58 @@ class GameAdmin(admin.ModelAdmin):
 
         return initial
 
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        """
+        Refresh the rollups once the game and its players are saved, instead of after every player.
+        """
+
+        with rollups.deferred():
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def delete_model(self, request, obj):
+        """
+        Refresh the rollups once the game and its players are deleted.
+        """
+
+        with rollups.deferred():
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        """
+        Refresh the rollups once after deleting the selected games, each day being recomputed only once.
+        """
+
+        with rollups.deferred():
+            super().delete_queryset(request, queryset)
+
     def save_related(self, request, form, formsets, change):
         """
-        During saving, delete the prefill image from the session object.
+        During saving, update the MVP of each team and the fingerprint of the game, and delete the prefill image from
+        the session object.
         """
 
         super(GameAdmin, self).save_related(request, form, formsets, change)
+        update_mvp([form.instance])
+        if update_fingerprints([form.instance]):
+            messages.warning(request, "Une partie identique existe déjà")
         if "prefilled_img" in request.session:
             del request.session["prefilled_img"]
 
     def admin_bulk_import(self, request):
         """
-        Custom admin view that enables for the bulk import of a Web Scraper csv export from uniteapi.dev.
+        Custom admin view that enables for the bulk import of a Web Scraper csv export from uniteapi.dev. The import is
+        queued as a background job, whose page displays the progress.
         """
 
         if request.method == "POST":
             bulk_import_form = BulkImportForm(request.POST, request.FILES)
             if bulk_import_form.is_valid():
-                csv_file = bulk_import_form.cleaned_data["csv_file"]
-                season = bulk_import_form.cleaned_data["season"]
-
-                try:
-                    num_games = bulk_import(csv_file, season)
-                except ValueError as e:
-                    messages.error(request, e)
-                    return HttpResponseRedirect(reverse('admin:stats_game_bulk_import'))
-
-                messages.success(
-                    request,
-                    f"Successfully imported {num_games} game{'s' if num_games != 1 else ''}"
-                )
-                return HttpResponseRedirect(reverse('admin:stats_game_add'))
+                job = ImportJob.objects.create(csv_file=bulk_import_form.cleaned_data["csv_file"],
+                                               season=bulk_import_form.cleaned_data["season"])
+                jobs.submit()
+
+                messages.info(request, "Import mis en file d'attente")
+                return HttpResponseRedirect(reverse('admin:stats_importjob_change', args=[job.pk]))
         else:
             bulk_import_form = BulkImportForm()
 
@@ -224,35 +248,93 @@ class GameAdmin(admin.ModelAdmin):
             return HttpResponseRedirect(reverse('admin:stats_game_add'))
 
         try:
-            ocr_tool = pyocr.get_available_tools()[0]
-        except IndexError:
-            messages.error(request, "Aucun OCR installé pour PyOCR")
-            return HttpResponseRedirect(reverse('admin:stats_game_add'))
-
-        if "eng" not in ocr_tool.get_available_languages():
-            messages.error("L'anglais n'est pas disponible dans les langues de l'OCR")
+            ocr_engine = ocr.get_engine()
+        except ocr.OcrUnavailable as e:
+            messages.error(request, str(e))
             return HttpResponseRedirect(reverse('admin:stats_game_add'))
 
         if request.method == "POST":
             prefill_form = PrefillForm(request.POST, request.FILES)
             if prefill_form.is_valid():
                 raw_img = prefill_form.cleaned_data["picture"]
-                request.session["prefilled_img"] = prefill_game(raw_img, ocr_tool)
+                began = time.perf_counter()
+                request.session["prefilled_img"] = prefill_game(
+                    raw_img, ocr_engine, single_pass=getattr(settings, "OCR_SINGLE_PASS", False)
+                )
+                messages.info(request, "Écran de résultat analysé en {:.0f} ms".format(
+                    1000 * (time.perf_counter() - began)
+                ))
                 return HttpResponseRedirect(reverse('admin:stats_game_add'))
         else:
             prefill_form = PrefillForm()
 
+        metrics = ocr_engine.metrics()
         base_context = self.admin_site.each_context(request)
         context = base_context | {
             "title": "Pré-remplissage de partie",
             "opts": Game._meta,
             "form": prefill_form,
-            "display_message": "Téléverser un écran de résultat pour pré-remplir le formulaire de création de partie."
+            "display_message": "Téléverser un écran de résultat pour pré-remplir le formulaire de création de partie.",
+            "ocr_metrics": metrics,
+            "ocr_run_average": 1000 * metrics["run_time"] / metrics["runs"] if metrics["runs"] else None,
+            "ocr_last_batch": metrics["last_batch"] and (metrics["last_batch"][0], 1000 * metrics["last_batch"][1]),
         }
 
         return TemplateResponse(request, "stats/admin_custom_form.html", context)
 
 
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """
+    Custom admin for the ImportJob model. Jobs are created from the bulk import view and can't be modified, their page
+    refreshes itself until they are finished. Viewing the jobs picks up those left by a restart of the application.
+    """
+
+    change_form_template = "stats/admin_import_job.html"
+    ordering = ("-created_at",)
+    list_filter = ["status", "season"]
+    list_display = ["created_at", "season", "status", "progress"]
+    fields = ["csv_file", "season", "status", "progress", "created_at", "started_at", "updated_at", "finished_at",
+              "error_list"]
+    readonly_fields = fields
+
+    @admin.display(description="Progression")
+    def progress(self, obj):
+        if obj.num_games is None:
+            return "-"
+        return (f"{obj.num_parsed}/{obj.num_games} validées, {obj.num_inserted}/{obj.num_games} importées, "
+                f"{obj.num_skipped} déjà présentes")
+
+    @admin.display(description="Erreurs")
+    def error_list(self, obj):
+        if not obj.errors:
+            return "-"
+        return format_html("<ul>{}</ul>", format_html_join("", "<li>{}</li>", ((e,) for e in obj.errors)))
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        jobs.recover()
+        return super().changelist_view(request, extra_context)
+
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        jobs.recover()
+        return super().change_view(request, object_id, form_url, extra_context)
+
+
+class PokemonAliasInline(admin.TabularInline):
+    """
+    Inline for the names given to a Pokémon by external sources.
+    """
+
+    model = PokemonAlias
+    extra = 0
+
+
 @admin.register(Pokemon)
 class PokemonAdmin(admin.ModelAdmin):
     """
@@ -260,6 +342,7 @@ class PokemonAdmin(admin.ModelAdmin):
     """
 
     ordering = ("category", "name",)
+    inlines = [PokemonAliasInline]
 
     def get_readonly_fields(self, request, obj=None):
         """
@@ -272,6 +355,15 @@ class PokemonAdmin(admin.ModelAdmin):
             return []
 
 
+class TeammateAliasInline(admin.TabularInline):
+    """
+    Inline for the other names of a teammate.
+    """
+
+    model = TeammateAlias
+    extra = 0
+
+
 @admin.register(Teammate)
 class TeammateAdmin(admin.ModelAdmin):
     """
@@ -279,6 +371,7 @@ class TeammateAdmin(admin.ModelAdmin):
     """
 
     ordering = ("pseudo",)
+    inlines = [TeammateAliasInline]
 
 
 @admin.register(Season)
@@ -0,0 +1,120 @@
+"""
+Resolution of the names given to the Pokémon and to the teammates by external sources (uniteapi.dev, the game
+itself...). Every alias is loaded once per process into dicts, so that resolving a name is a dict lookup. The dicts are
+reloaded once an alias, a Pokémon or a teammate changed, which is tracked by a version stored in Django's cache so that
+every process notices it.
+"""
+
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Pokemon, PokemonAlias, Teammate, TeammateAlias
+
+VERSION_KEY = "stats:aliases_version"
+
+
+@dataclass
+class _Aliases:
+    """
+    Every alias, as loaded from the database.
+    """
+
+    version: int
+    pokemon_sources: dict  # {source: {alias: Pokémon ID}}
+    pokemon_defaults: dict  # {name or ID: Pokémon ID}
+    teammates: dict  # {pseudo or alias: pseudo}
+
+
+_loaded = None
+
+
+def invalidate():
+    """
+    Force every process to reload the aliases, once the current transaction is committed.
+    """
+
+    transaction.on_commit(_bump_version)
+
+
+def _bump_version():
+    global _loaded
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    _loaded = None
+
+
+def _load(version):
+    defaults = {}
+    for pokemon_id, name in Pokemon.objects.values_list("id", "name"):
+        defaults[pokemon_id.lower()] = pokemon_id
+        defaults[name.lower()] = pokemon_id
+
+    sources = {}
+    for source, alias, pokemon_id in PokemonAlias.objects.values_list("source", "alias", "pokemon_id"):
+        sources.setdefault(source, dict(defaults))[alias] = pokemon_id
+
+    # A pseudo always names its own teammate, even if it's the alias of another one
+    teammates = dict(TeammateAlias.objects.values_list("alias", "teammate_id"))
+    teammates |= {pseudo: pseudo for pseudo in Teammate.objects.values_list("pseudo", flat=True)}
+
+    return _Aliases(version, sources, defaults, teammates)
+
+
+def _get_loaded():
+    global _loaded
+    version = cache.get(VERSION_KEY)
+    if version is None:  # Evicted, the aliases may have changed since
+        version = time.time_ns()
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    loaded = _loaded
+    if loaded is None or loaded.version != version:
+        loaded = _loaded = _load(version)
+    return loaded
+
+
+def get_aliases(source):
+    """
+    Get every name of the Pokémon for a source.
+
+    :param source: Source of the names, e.g. PokemonAlias.UNITEAPI.
+    :return: A dict of Pokémon IDs indexed by lowercase name, shared by every caller so it mustn't be modified.
+    """
+
+    loaded = _get_loaded()
+    return loaded.pokemon_sources.get(source, loaded.pokemon_defaults)
+
+
+def resolve(source, name):
+    """
+    Get the Pokémon named by a source.
+
+    :param source: Source of the name, e.g. PokemonAlias.UNITEAPI.
+    :param name: Name of the Pokémon, in any case.
+    :return: The ID of the Pokémon, or None if the name is unknown.
+    """
+
+    return get_aliases(source).get(name.lower())
+
+
+def get_teammates():
+    """
+    Get every name of the teammates: their pseudos, and their aliases in-game or in the scraper dumps.
+
+    :return: A dict of pseudos indexed by name, shared by every caller so it mustn't be modified.
+    """
+
+    return _get_loaded().teammates
+
+
+def resolve_teammate(name):
+    """
+    Get the teammate behind a name.
+
+    :param name: Pseudo or alias of the teammate, case sensitive.
+    :return: The pseudo of the teammate, or None if the name isn't one of theirs.
+    """
+
+    return get_teammates().get(name)
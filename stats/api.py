@@ -0,0 +1,205 @@
+"""
+Read-only JSON API for the games and statistics. Every response carries an ETag and a Last-Modified header derived
+from the global data version, so that clients can revalidate their copy without the statistics being computed again.
+"""
+
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from . import cache as stats_cache
+from . import queries, utils
+from .forms import GamesListFilterForm, TeamStatFilterForm
+from .models import Game, Teammate
+from .pagination import keyset_paginate
+
+
+def _etag(request, *args, **kwargs):
+    return f'"{stats_cache.get_data_version()}"'
+
+
+def _last_modified(request, *args, **kwargs):
+    return stats_cache.get_last_modified()
+
+
+def api_view(view):
+    """
+    Decorator for the API views: only GET (and HEAD) requests are allowed, and a request whose If-None-Match or
+    If-Modified-Since header matches the data version is answered with a 304 before the view is even called.
+    """
+
+    return require_GET(condition(etag_func=_etag, last_modified_func=_last_modified)(view))
+
+
+def _filters(form_class, request):
+    """
+    Validate the GET parameters of a request with one of the filter forms.
+
+    :return: The cleaned data of the form.
+    """
+
+    filter_form = form_class(request.GET)
+    filter_form.is_valid()
+    return filter_form.cleaned_data
+
+
+def _game_json(context):
+    """
+    Convert the context of a game, as built by utils.construct_games_context, to a JSON serializable dict.
+    """
+
+    return {
+        "id": context["pk"],
+        "date": context["date"].isoformat(),
+        "season": context["season_id"],
+        "is_won": context["is_won"],
+        "is_forfeit": context["is_forfeit"],
+        "teams": [
+            {
+                "score": team["score"],
+                "players": [
+                    {
+                        "pseudo": player["pseudo"],
+                        "pokemon": player["pokemon"].id,
+                        "pokemon_name": player["pokemon"].name,
+                        "scored": player["scored"],
+                        "kills": player["kills"],
+                        "assists": player["assists"],
+                        "result": player["result"],
+                        "is_mvp": player["is_mvp"],
+                    } for player in team["players"]
+                ]
+            } for team in context["teams"]
+        ],
+    }
+
+
+def _totals_json(totals, split=True, **extra):
+    """
+    Convert a queries.Totals object to a JSON serializable dict.
+
+    :param split: Whether to add the same statistics on the won and lost games.
+    """
+
+    if split:
+        extra |= {"won": _totals_json(totals.won, split=False), "lost": _totals_json(totals.lost, split=False)}
+    return extra | {
+        "num_games": totals.num_games,
+        "winrate": totals.winrate,
+        "num_mvp": totals.num_mvp,
+        "avg_scored": totals.avg_scored,
+        "avg_kills": totals.avg_kills,
+        "avg_assists": totals.avg_assists,
+        "avg_result": totals.avg_result,
+    }
+
+
+def _moving_averages_json(moving_averages):
+    return [
+        _totals_json(point, key=point.key.isoformat() if hasattr(point.key, "isoformat") else point.key)
+        for point in moving_averages
+    ]
+
+
+@api_view
+def games(request):
+    """
+    List of games, most recent first, paginated with the same cursors as the games list.
+
+    :param request: Request object.
+    """
+
+    filters = _filters(GamesListFilterForm, request)
+    season = filters.get("season")
+
+    queryset = Game.objects.filter(season=season) if season else Game.objects.all()
+    if filters.get("exclude_bots"):
+        queryset = queryset.exclude(playerstat__is_bot=True)
+    page = keyset_paginate(queryset, filters.get("per_page") or 10,
+                           after=request.GET.get("after"), before=request.GET.get("before"))
+
+    return JsonResponse({
+        "games": [_game_json(context) for context in utils.construct_games_context(page)],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    })
+
+
+@api_view
+def game(request, game_id):
+    """
+    Details of a game.
+
+    :param request: Request object.
+    :param game_id: Primary key associated to the game.
+    """
+
+    try:
+        obj = Game.objects.get(pk=game_id)
+    except Game.DoesNotExist:
+        raise Http404("Partie inexistante")
+
+    return JsonResponse(_game_json(utils.construct_games_context([obj])[0]))
+
+
+@api_view
+def team_stats(request):
+    """
+    Statistics of the team.
+
+    :param request: Request object.
+    """
+
+    filters = _filters(TeamStatFilterForm, request)
+    season = filters.get("season")
+    season = season and season.pk
+
+    exclude_bots = filters.get("exclude_bots", False)
+
+    statistics = queries.cached_team_statistics(season, exclude_bots)
+    if filters.get("window"):
+        moving_averages = queries.cached_sliding_averages(filters["window"], filters.get("window_size") or 10,
+                                                          season=season, exclude_bots=exclude_bots)
+    else:
+        moving_averages = queries.cached_moving_averages(season=season, exclude_bots=exclude_bots)
+
+    return JsonResponse({
+        "season": season,
+        "num_games": statistics.num_games,
+        "winrate": statistics.winrate,
+        "per_opponent": [_totals_json(s, pokemon=s.pokemon, pokemon_name=s.name) for s in statistics.per_opponent],
+        "per_ally": [_totals_json(s, pseudo=s.pseudo) for s in statistics.per_ally],
+        "moving_averages": _moving_averages_json(moving_averages),
+    })
+
+
+@api_view
+def player_stats(request, pseudo):
+    """
+    Statistics of a teammate.
+
+    :param request: Request object.
+    :param pseudo: Player pseudo.
+    """
+
+    if not Teammate.objects.filter(pseudo=pseudo).exists():
+        raise Http404("Coéquipier inexistant")
+
+    filters = _filters(TeamStatFilterForm, request)
+    season = filters.get("season")
+    season = season and season.pk
+
+    exclude_bots = filters.get("exclude_bots", False)
+
+    statistics = queries.cached_player_statistics(pseudo, season, exclude_bots)
+    if filters.get("window"):
+        moving_averages = queries.cached_sliding_averages(filters["window"], filters.get("window_size") or 10,
+                                                          pseudo=pseudo, season=season, exclude_bots=exclude_bots)
+    else:
+        moving_averages = queries.cached_moving_averages(pseudo, season, exclude_bots)
+
+    return JsonResponse({
+        "pseudo": pseudo,
+        "season": season,
+        "totals": _totals_json(statistics.totals),
+        "moving_averages": _moving_averages_json(moving_averages),
+    })
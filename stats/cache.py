@@ -0,0 +1,252 @@
+"""
+Cache helpers. They only rely on Django's cache framework, so that any configured backend (local memory, filesystem,
+Redis...) can be used.
+"""
+
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+DATA_VERSION_KEY = "stats:data_version"
+# Version of the names and categories of the Pokémon, shown by every game card
+POKEMON_VERSION_KEY = "stats:pokemon_version"
+
+# Rendered game cards are invalidated by their version, so they can be kept for a long time
+GAME_CARD_TIMEOUT = 60 * 60 * 24 * 7
+# Same thing for the aggregated statistics, invalidated by the global data version
+AGGREGATE_TIMEOUT = 60 * 60 * 24
+
+# Aggregates cached with get_or_compute, whose hits and misses are counted
+AGGREGATE_NAMES = ("team_statistics", "player_statistics", "moving_averages", "sliding_averages")
+# Hits and misses are counted in the memory of each process, and added to the shared counters of the cache at most once
+# per this number of seconds, so that a cache hit doesn't cost cache writes
+COUNTER_FLUSH_INTERVAL = 10
+
+_pending_counts = Counter()
+_counts_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _new_version():
+    """
+    Generate a new version number. Using the current time instead of a counter means that a version key evicted from
+    the cache can never be recreated with a version that was already used.
+    """
+
+    return time.time_ns()
+
+
+def get_data_version():
+    """
+    Get the global data version, that changes every time a game, a player or a teammate is modified.
+
+    :return: The version number.
+    """
+
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(DATA_VERSION_KEY, version, timeout=None):
+            version = cache.get(DATA_VERSION_KEY, version)
+    return version
+
+
+def get_last_modified():
+    """
+    Get the date of the last modification of the data, derived from the global data version.
+
+    :return: An aware datetime.
+    """
+
+    return datetime.fromtimestamp(get_data_version() // 10 ** 9, tz=timezone.utc)
+
+
+def bump_data_version():
+    """
+    Invalidate everything that depends on the global data version. Inside a transaction, the version is bumped again on
+    commit, so that an aggregate computed by another connection before the commit can't be kept under the new version.
+    Bumping it several times on commit is harmless.
+    """
+
+    cache.set(DATA_VERSION_KEY, _new_version(), timeout=None)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(_bump_on_commit)
+
+
+def _bump_on_commit():
+    cache.set(DATA_VERSION_KEY, _new_version(), timeout=None)
+
+
+def _counter_key(name, outcome):
+    return f"stats:counter:{name}:{outcome}"
+
+
+def _count(name, outcome):
+    with _counts_lock:
+        _pending_counts[name, outcome] += 1
+        if time.monotonic() - _last_flush < COUNTER_FLUSH_INTERVAL:
+            return
+    flush_counters()
+
+
+def flush_counters():
+    """
+    Add the hits and misses counted by this process to the shared counters of the cache.
+    """
+
+    global _last_flush
+    with _counts_lock:
+        pending = dict(_pending_counts)
+        _pending_counts.clear()
+        _last_flush = time.monotonic()
+
+    for (name, outcome), count in pending.items():
+        key = _counter_key(name, outcome)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:  # Evicted in the meantime
+            pass
+
+
+def get_counters():
+    """
+    Get the number of cache hits and misses of each aggregate, since the last reset. The counts of the other processes
+    may be late by up to COUNTER_FLUSH_INTERVAL seconds.
+
+    :return: A dict of {"hits": int, "misses": int} dicts indexed by aggregate name.
+    """
+
+    flush_counters()
+    keys = [_counter_key(name, outcome) for name in AGGREGATE_NAMES for outcome in ("hits", "misses")]
+    values = cache.get_many(keys)
+    return {
+        name: {outcome: values.get(_counter_key(name, outcome), 0) for outcome in ("hits", "misses")}
+        for name in AGGREGATE_NAMES
+    }
+
+
+def reset_counters():
+    """
+    Reset the hit and miss counters of every aggregate.
+    """
+
+    with _counts_lock:
+        _pending_counts.clear()
+    cache.delete_many([_counter_key(name, outcome) for name in AGGREGATE_NAMES for outcome in ("hits", "misses")])
+
+
+def get_or_compute(name, compute, *key_parts, timeout=AGGREGATE_TIMEOUT):
+    """
+    Get an aggregated value from the cache, or compute and store it. The value is stored along with the global data
+    version, so that it's never served once the data changed.
+
+    :param name: Name of the value, one of AGGREGATE_NAMES.
+    :param compute: Callable computing the value when it's missing.
+    :param key_parts: Parameters the value depends on, e.g. the filters of a page.
+    :param timeout: Cache timeout, in seconds.
+    :return: The value.
+    """
+
+    digest = hashlib.md5(repr(key_parts).encode()).hexdigest()
+    key = f"stats:{name}:{get_data_version()}:{digest}"
+
+    value = cache.get(key)
+    if value is None:
+        _count(name, "misses")
+        value = compute()
+        cache.set(key, value, timeout)
+    else:
+        _count(name, "hits")
+    return value
+
+
+def _game_version_key(pk):
+    return f"stats:game_version:{pk}"
+
+
+def _game_card_key(pk, version):
+    return f"stats:game_card:{pk}:{version}"
+
+
+def games_count_key(season=None, exclude_bots=False):
+    """
+    Cache key of the total number of games, used by the games list paginator.
+
+    :param season: Season number, or None for every season.
+    :param exclude_bots: Whether the games played against bots are excluded.
+    """
+
+    if exclude_bots:  # Depends on the players too, so it's simply tied to the data version
+        return f"stats:games_count:{season or ''}:no_bots:{get_data_version()}"
+    return f"stats:games_count:{season or ''}"
+
+
+def get_game_versions(pks):
+    """
+    Get the version of the card of each given game, made of the data version of the game and of the version of the
+    Pokémon, initializing the missing ones.
+
+    :param pks: Primary keys of the games.
+    :return: A dict of versions indexed by game primary key.
+    """
+
+    keys = {_game_version_key(pk): pk for pk in pks}
+    values = cache.get_many([*keys, POKEMON_VERSION_KEY])
+    versions = {keys[k]: v for k, v in values.items() if k in keys}
+
+    missing = {k: _new_version() for k, pk in keys.items() if pk not in versions}
+    if POKEMON_VERSION_KEY not in values:
+        missing[POKEMON_VERSION_KEY] = _new_version()
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions |= {keys[k]: v for k, v in missing.items() if k in keys}
+
+    pokemon_version = values.get(POKEMON_VERSION_KEY) or missing[POKEMON_VERSION_KEY]
+    return {pk: f"{pokemon_version}.{version}" for pk, version in versions.items()}
+
+
+def bump_game_version(pk):
+    """
+    Invalidate every cached item related to a game.
+
+    :param pk: Primary key of the game.
+    """
+
+    cache.set(_game_version_key(pk), _new_version(), timeout=None)
+
+
+def bump_pokemon_version():
+    """
+    Invalidate the rendered card of every game, as they show the names and categories of the Pokémon.
+    """
+
+    cache.set(POKEMON_VERSION_KEY, _new_version(), timeout=None)
+
+
+def get_game_cards(versions):
+    """
+    Retrieve the cached rendered cards of some games.
+
+    :param versions: A dict of game versions indexed by primary key, as returned by get_game_versions.
+    :return: A dict of rendered cards indexed by game primary key, the cards that aren't cached are missing.
+    """
+
+    keys = {_game_card_key(pk, version): pk for pk, version in versions.items()}
+    return {keys[k]: card for k, card in cache.get_many(keys).items()}
+
+
+def set_game_cards(cards, versions):
+    """
+    Store rendered game cards in the cache.
+
+    :param cards: A dict of rendered cards indexed by game primary key.
+    :param versions: A dict of game versions indexed by primary key, as returned by get_game_versions.
+    """
+
+    cache.set_many({_game_card_key(pk, versions[pk]): card for pk, card in cards.items()}, timeout=GAME_CARD_TIMEOUT)
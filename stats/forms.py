@@ -66,6 +66,7 @@ class GamesListFilterForm(forms.Form):
     per_page = forms.IntegerField(label="Éléments par page", label_suffix="", min_value=1, initial=10, required=False)
     season = DBFieldModelChoiceField(queryset=Season.objects.all().order_by("number"), label="Saison",
                                      display_field="number", label_suffix="", initial=None, required=False)
+    exclude_bots = forms.BooleanField(label="Exclure les parties contre des bots", label_suffix="", required=False)
 
     def clean_per_page(self):
         return self.cleaned_data["per_page"] or 10
@@ -81,10 +82,21 @@ class TeamStatFilterForm(forms.Form):
 
     season = DBFieldModelChoiceField(queryset=Season.objects.all().order_by("number"), label="Saison",
                                      display_field="number", label_suffix="", initial=None, required=False)
+    window = forms.ChoiceField(label="Moyenne glissante", label_suffix="", required=False, initial="", choices=[
+        ("", "Par jour ou par saison"), ("games", "Sur les N dernières parties"), ("days", "Sur les N derniers jours")
+    ])
+    window_size = forms.IntegerField(label="N", label_suffix="", min_value=1, initial=10, required=False)
+    exclude_bots = forms.BooleanField(label="Exclure les parties contre des bots", label_suffix="", required=False)
 
     def clean_season(self):
         return self.cleaned_data["season"] or None
 
+    def clean_window(self):
+        return self.cleaned_data["window"] or None
+
+    def clean_window_size(self):
+        return self.cleaned_data["window_size"] or 10
+
 
 class GameAdminForm(forms.ModelForm):
     """
@@ -103,7 +115,7 @@ class PlayerInlineAdminForm(forms.ModelForm):
 
     class Meta:
         model = PlayerStat
-        exclude = tuple()
+        exclude = ("is_mvp",)  # Computed when the game is saved
 
     def __init__(self, *args, **kwargs):
         try:
@@ -0,0 +1,91 @@
+"""
+Per-request measures (SQL queries, database time, template rendering time), collected by
+stats.middleware.RequestInstrumentationMiddleware.
+"""
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.template.backends import django as django_backend
+
+_current = ContextVar("stats_request_metrics", default=None)
+
+
+@dataclass
+class RequestMetrics:
+    """
+    Measures of a single request. Durations are in seconds.
+    """
+
+    num_queries: int = 0
+    db_time: float = 0
+    template_time: float = 0
+    _template_depth: int = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper (see connection.execute_wrapper) counting the queries and their duration.
+        """
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.num_queries += 1
+
+
+def start_request():
+    """
+    Start collecting the measures of the current request.
+
+    :return: A (RequestMetrics object, token) tuple, the token must be given back to end_request.
+    """
+
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+class Template:
+    """
+    Wrapper around a template of the Django backend, that adds its rendering time to the current request.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+
+        # Templates rendered while rendering another one are already timed
+        metrics._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics._template_depth -= 1
+            if not metrics._template_depth:
+                metrics.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    The default template backend, with the rendering time of the templates measured.
+    """
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name))
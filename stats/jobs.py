@@ -0,0 +1,115 @@
+"""
+Background import jobs. They are run by a thread pool inside the application, so that no broker is needed: the
+ImportJob table is the queue, and a single worker thread processes the pending jobs one at a time, oldest first. The
+jobs left by a restart of the application are picked up again by recover.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ImportJob
+from .utils import BulkImportError, bulk_import
+
+logger = logging.getLogger("stats.jobs")
+
+# Number of games committed per transaction, the progress of the job being visible after each of them
+JOB_CHUNK_SIZE = 200
+# A running job saves its progress at least once per chunk, both while validating and inserting. A job that didn't for
+# this long was interrupted by a restart, it's queued again. Its games already committed are skipped by the new run,
+# thanks to their fingerprint.
+STALE_JOB_TIMEOUT = timedelta(minutes=10)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stats-jobs")
+
+
+def submit():
+    """
+    Wake the worker up once the transaction that created a job is committed. Jobs submitted while another one is
+    running are queued.
+    """
+
+    transaction.on_commit(wake)
+
+
+def wake():
+    """
+    Make the worker process the pending jobs.
+    """
+
+    _executor.submit(_work)
+
+
+def recover():
+    """
+    Queue again the jobs left running by a process that was stopped, and wake the worker up if any job is pending, so
+    that the jobs queued before a restart of the application don't wait for the next import. A job is only considered
+    stopped when its progress wasn't saved for STALE_JOB_TIMEOUT, however long it has been running.
+
+    :return: Number of jobs queued again.
+    """
+
+    stale = ImportJob.objects.filter(status=ImportJob.RUNNING, updated_at__lt=timezone.now() - STALE_JOB_TIMEOUT)
+    num_requeued = stale.update(status=ImportJob.PENDING, started_at=None, updated_at=None)
+    if num_requeued:
+        logger.warning("%d interrupted import job(s) queued again", num_requeued)
+    if ImportJob.objects.filter(status=ImportJob.PENDING).exists():
+        wake()
+    return num_requeued
+
+
+def _work():
+    try:
+        process_pending()
+    except Exception:
+        logger.exception("Import jobs worker failed")
+    finally:
+        connection.close()  # The connection of the worker thread isn't closed by any request
+
+
+def process_pending():
+    """
+    Run the pending jobs, oldest first, until none is left. Each job is claimed with a conditional update, so that it's
+    never run twice even if several processes share the database.
+    """
+
+    while True:
+        job = ImportJob.objects.filter(status=ImportJob.PENDING).order_by("created_at", "pk").first()
+        if job is None:
+            return
+        now = timezone.now()
+        if ImportJob.objects.filter(pk=job.pk, status=ImportJob.PENDING).update(status=ImportJob.RUNNING,
+                                                                               started_at=now, updated_at=now):
+            run(job)
+
+
+def run(job):
+    """
+    Import the file of a job, saving its progress along the way and its errors at the end. The file is deleted once the
+    job is finished.
+
+    :param job: An ImportJob object, already claimed.
+    """
+
+    def progress(num_games, num_parsed, num_inserted, num_skipped):
+        ImportJob.objects.filter(pk=job.pk).update(num_games=num_games, num_parsed=num_parsed,
+                                                   num_inserted=num_inserted, num_skipped=num_skipped,
+                                                   updated_at=timezone.now())
+
+    status, errors = ImportJob.DONE, []
+    try:
+        bulk_import(job.csv_file, job.season, chunk_size=JOB_CHUNK_SIZE, progress=progress)
+    except BulkImportError as e:
+        status, errors = ImportJob.FAILED, e.messages
+    except Exception:
+        logger.exception("Import job %s failed", job.pk)
+        status, errors = ImportJob.FAILED, ["Erreur inattendue, voir les logs du serveur"]
+
+    now = timezone.now()
+    ImportJob.objects.filter(pk=job.pk).update(status=status, errors=errors, finished_at=now, updated_at=now,
+                                               csv_file="")
+    job.csv_file.close()
+    job.csv_file.delete(save=False)
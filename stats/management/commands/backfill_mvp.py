@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from stats.models import Game
+from stats.utils import chunked, update_mvp
+
+
+class Command(BaseCommand):
+    """
+    Compute and store the MVP flag of the players of every game that is already in database.
+    """
+
+    help = "Compute the MVP flag of the players of every existing game."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of games updated per query.")
+
+    def handle(self, *args, **options):
+        game_ids = list(Game.objects.order_by("pk").values_list("pk", flat=True))
+
+        num_changed = 0
+        for batch in chunked(game_ids, options["batch_size"]):
+            num_changed += update_mvp(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {num_changed} player{'s' if num_changed != 1 else ''} in {len(game_ids)} games"
+        ))
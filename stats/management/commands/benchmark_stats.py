@@ -0,0 +1,101 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from stats import queries
+from stats.models import Game, PlayerStat, Teammate
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "stats.json"
+
+
+class Command(BaseCommand):
+    """
+    Time the team and player statistics computed by the statistics engine on the current database (usually filled with
+    generate_fake_games), and compare them with a recorded result. The command fails if a statistic got slower or uses
+    more queries than the recorded result allows.
+    """
+
+    help = "Time the team and player statistics and compare them with a recorded result."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Number of runs of each measure.")
+        parser.add_argument("--season", type=int, default=None, help="Season filter.")
+        parser.add_argument("--pseudo", default=None, help="Teammate used for the player statistics.")
+        parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Recorded result JSON file.")
+        parser.add_argument("--save", action="store_true", help="Write the results as the new recorded result.")
+        parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression of the latency.")
+
+    def measure(self, compute, repeat):
+        """
+        Run a statistic several times.
+
+        :return: A dict with the median and max latency (ms) and the number of queries.
+        """
+
+        durations = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                compute()
+                durations.append(1000 * (time.perf_counter() - start))
+
+        return {
+            "median_ms": round(statistics.median(durations), 2),
+            "max_ms": round(max(durations), 2),
+            "queries": len(ctx.captured_queries),
+        }
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be positive")
+
+        season = options["season"]
+        pseudo = options["pseudo"] or Teammate.objects.order_by("pseudo").values_list("pseudo", flat=True).first()
+
+        measures = [("team", lambda: queries.team_statistics(season))]
+        if pseudo:
+            measures.append(("player", lambda: queries.player_statistics(pseudo, season)))
+
+        dataset = {"games": Game.objects.count(), "player_stats": PlayerStat.objects.count(), "season": season,
+                   "pseudo": pseudo}
+        self.stdout.write(f"{dataset['games']} games, {dataset['player_stats']} player stats, "
+                          f"season {season or 'all'}, player {pseudo}")
+
+        baseline_file = options["baseline"]
+        baseline = None
+        if not options["save"]:
+            if not baseline_file.exists():
+                raise CommandError(f"No recorded result in {baseline_file}, use --save to record one")
+            baseline = json.loads(baseline_file.read_text())
+        if baseline is not None and baseline["dataset"] != dataset:
+            raise CommandError(f"{baseline_file} was recorded on another dataset: {baseline['dataset']}")
+
+        results = {}
+        messages = []
+        for name, compute in measures:
+            result = results[name] = self.measure(compute, options["repeat"])
+            line = f"{name:<8} median {result['median_ms']:9.1f} ms, max {result['max_ms']:9.1f} ms, " \
+                   f"{result['queries']} queries"
+            reference = baseline["results"].get(name) if baseline else None
+            if reference:
+                line += f" (recorded: median {reference['median_ms']:9.1f} ms, {reference['queries']} queries)"
+                if result["median_ms"] > reference["median_ms"] * (1 + options["threshold"]):
+                    messages.append(f"{name}: median_ms {reference['median_ms']} -> {result['median_ms']}")
+                if result["queries"] > reference["queries"]:
+                    messages.append(f"{name}: queries {reference['queries']} -> {result['queries']}")
+            self.stdout.write(line)
+
+        if options["save"]:
+            baseline_file.parent.mkdir(parents=True, exist_ok=True)
+            baseline_file.write_text(json.dumps({"dataset": dataset, "results": results}, indent=2) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Results written to {baseline_file}"))
+        elif messages:
+            raise CommandError("Regressions compared with the recorded result:\n" + "\n".join(messages))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"No regression compared with {baseline_file}"))
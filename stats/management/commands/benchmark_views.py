@@ -0,0 +1,183 @@
+import json
+import math
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from stats.models import Game, PlayerStat, Season
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "views.json"
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a list of values.
+    """
+
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def scenarios():
+    """
+    Requests measured by the benchmark, on the data of the current database.
+
+    :return: A list of (name, url, GET parameters) tuples.
+    """
+
+    last_game = Game.objects.order_by("-date", "-id").first()
+    last_season = Season.objects.order_by("-number").first()
+    pseudo = PlayerStat.objects.filter(is_opponent=False).values("pseudo").annotate(n=Count("id")).order_by(
+        "-n"
+    ).values_list("pseudo", flat=True).first()
+    if last_game is None or pseudo is None:
+        raise CommandError("No game in database, use generate_fake_games first")
+
+    result = [(f"games_list per_page={n}", reverse("games_list"), {"per_page": n}) for n in (10, 50, 100)]
+    result += [
+        ("games_list page=50", reverse("games_list"), {"page": 50}),
+        ("game_detail", reverse("game_detail", kwargs={"game_id": last_game.pk}), {}),
+        ("team_stats", reverse("team_stats"), {}),
+        ("team_stats season", reverse("team_stats"), {"season": last_season.number}),
+        ("team_stats_chart window", reverse("team_stats_chart"), {"season": last_season.number, "window": "games"}),
+        ("player_detail", reverse("player_detail", kwargs={"pseudo": pseudo}), {}),
+        ("player_detail season", reverse("player_detail", kwargs={"pseudo": pseudo}), {"season": last_season.number}),
+    ]
+    return result
+
+
+class Command(BaseCommand):
+    """
+    Measure the pages through the test client on the current database (usually filled with generate_fake_games), and
+    compare them with a baseline. The command fails if a page got slower, uses more queries or more memory than the
+    baseline allows.
+
+    The statistics caches are cleared before every request (unless --warm is given), with a cache of its own so that
+    the configured one is left untouched.
+    """
+
+    help = "Benchmark the pages and compare them with a recorded baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Number of requests per page.")
+        parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON file.")
+        parser.add_argument("--save", action="store_true", help="Write the results as the new baseline.")
+        # The p50 of a page varies by up to 70 % from one run to the next on a shared machine, so only a latency that
+        # doubled fails. A regression that adds queries fails whatever its latency
+        parser.add_argument("--threshold", type=float, default=1.0,
+                            help="Allowed relative regression of the p50 latency.")
+        parser.add_argument("--memory-threshold", type=float, default=0.1,
+                            help="Allowed relative regression of the peak memory.")
+        parser.add_argument("--min-delta", type=float, default=5,
+                            help="Latency regressions under this number of milliseconds are ignored.")
+        parser.add_argument("--warm", action="store_true", help="Keep the cache between requests.")
+
+    def measure(self, client, url, params, repeat, warm):
+        """
+        Request a page several times.
+
+        :return: A dict with the p50 and p95 latency (ms), the number of queries and the peak memory (KiB).
+        """
+
+        cache.clear()
+        client.get(url, params)  # Warm the imports, connections and template loaders up
+
+        durations = []
+        num_queries = 0
+        for _ in range(repeat):
+            if not warm:
+                cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = client.get(url, params)
+                durations.append(1000 * (time.perf_counter() - start))
+            if response.status_code != 200:
+                raise CommandError(f"{url} answered {response.status_code}")
+            num_queries = max(num_queries, len(ctx.captured_queries))
+
+        # Tracing the allocations slows everything down, so the memory is measured separately
+        if not warm:
+            cache.clear()
+        tracemalloc.start()
+        try:
+            client.get(url, params)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "p50_ms": round(percentile(durations, 50), 2),
+            "p95_ms": round(percentile(durations, 95), 2),
+            "queries": num_queries,
+            "peak_kib": round(peak / 1024, 1),
+        }
+
+    def regressions(self, name, result, reference, threshold, memory_threshold, min_delta):
+        """
+        Compare a result with its baseline. The p95 latency is only reported, being the noisiest measure.
+
+        :return: A list of messages, empty if nothing regressed.
+        """
+
+        messages = []
+        latency, reference_latency = result["p50_ms"], reference["p50_ms"]
+        if latency > reference_latency * (1 + threshold) and latency - reference_latency > min_delta:
+            messages.append(f"{name}: p50_ms {reference['p50_ms']} -> {result['p50_ms']}")
+        if result["queries"] > reference["queries"]:
+            messages.append(f"{name}: queries {reference['queries']} -> {result['queries']}")
+        if result["peak_kib"] > reference["peak_kib"] * (1 + memory_threshold):
+            messages.append(f"{name}: peak_kib {reference['peak_kib']} -> {result['peak_kib']}")
+        return messages
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be positive")
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=["testserver"], CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark_views"
+        }}):
+            client = Client()
+            for name, url, params in scenarios():
+                results[name] = self.measure(client, url, params, options["repeat"], options["warm"])
+                result = results[name]
+                self.stdout.write(f"{name:<28} p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                                  f"{result['queries']:3} queries  {result['peak_kib']:9.1f} KiB")
+
+        baseline_file = options["baseline"]
+        if options["save"]:
+            baseline_file.parent.mkdir(parents=True, exist_ok=True)
+            baseline_file.write_text(json.dumps({
+                "games": Game.objects.count(),
+                "warm": options["warm"],
+                "results": results,
+            }, indent=2) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_file}"))
+            return
+
+        if not baseline_file.exists():
+            raise CommandError(f"No baseline in {baseline_file}, use --save to record one")
+
+        baseline = json.loads(baseline_file.read_text())
+        if baseline.get("warm", False) != options["warm"]:
+            raise CommandError("The baseline wasn't recorded with the same --warm option")
+        if baseline["games"] != Game.objects.count():
+            raise CommandError(f"The baseline was recorded on {baseline['games']} games, use the same dataset")
+        messages = []
+        for name, result in results.items():
+            if name in baseline["results"]:
+                messages += self.regressions(name, result, baseline["results"][name], options["threshold"],
+                                             options["memory_threshold"], options["min_delta"])
+
+        if messages:
+            raise CommandError("Regressions compared with the baseline:\n" + "\n".join(messages))
+        self.stdout.write(self.style.SUCCESS(f"No regression compared with {baseline_file}"))
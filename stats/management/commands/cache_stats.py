@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from stats import cache as stats_cache
+
+
+class Command(BaseCommand):
+    """
+    Report the hit and miss counters of the cached statistics.
+    """
+
+    help = "Show the hit/miss counters of the cached statistics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters after showing them.")
+
+    def handle(self, *args, **options):
+        for name, counters in stats_cache.get_counters().items():
+            total = counters["hits"] + counters["misses"]
+            ratio = f"{100 * counters['hits'] / total:.1f} %" if total else "-"
+            self.stdout.write(f"{name:<20} {counters['hits']:>8} hits {counters['misses']:>8} misses  {ratio}")
+
+        if options["reset"]:
+            stats_cache.reset_counters()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
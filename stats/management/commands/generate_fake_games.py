@@ -0,0 +1,214 @@
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from stats import cache as stats_cache, rollups
+from stats.models import Game, PlayerStat, Pokemon, Season, Teammate
+from stats.utils import chunked, find_mvps, game_fingerprint
+
+# Hours of the day at which games are played, and their weight (mostly evenings)
+PLAY_HOURS = {12: 1, 13: 1, 14: 1, 17: 2, 18: 3, 19: 4, 20: 6, 21: 8, 22: 8, 23: 5, 0: 2}
+
+
+class Generator:
+    """
+    Generate fake games with a seeded random generator, so that the same options always give the same games.
+    """
+
+    def __init__(self, seed, teammates, pokemons, bot_rate, num_opponents):
+        self.rng = random.Random(seed)
+        self.bot_rate = bot_rate
+
+        # Some teammates play much more often than others, and each of them has a few favorite Pokémon. Weights are
+        # cumulative, see random.choices
+        self.teammates = teammates
+        self.teammate_weights = list(itertools.accumulate(self.rng.paretovariate(1.5) for _ in teammates))
+        self.favorites = {pseudo: self.rng.sample(pokemons, min(3, len(pokemons))) for pseudo in teammates}
+
+        # A few Pokémon are picked a lot, most of them seldom
+        self.pokemons = self.rng.sample(pokemons, len(pokemons))
+        self.pokemon_weights = list(itertools.accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(pokemons))))
+
+        self.opponents = [f"Dresseur{i}" for i in range(num_opponents)]
+
+    def dates(self, num_games, start, days):
+        """
+        Random dates between start and start + days, sorted.
+        """
+
+        hours, weights = list(PLAY_HOURS), list(PLAY_HOURS.values())
+        dates = []
+        for _ in range(num_games):
+            day = start + timedelta(days=self.rng.randrange(days))
+            hour = self.rng.choices(hours, weights)[0]
+            dates.append(day + timedelta(hours=hour, seconds=self.rng.randrange(3600)))
+        return sorted(dates)
+
+    def _pick_pokemons(self, favorites=None):
+        """
+        Pick five distinct Pokémon for a team, each player picking one of their favorites half of the time.
+        """
+
+        picked = []
+        for i in range(5):
+            choice = None
+            if favorites and self.rng.random() < 0.5:
+                choice = self.rng.choice(favorites[i])
+            while choice is None or choice in picked:
+                choice = self.rng.choices(self.pokemons, cum_weights=self.pokemon_weights)[0]
+            picked.append(choice)
+        return picked
+
+    def _player(self, pseudo, pokemon, is_opponent, strength, is_bot=False):
+        rng = self.rng
+        kills = min(int(rng.expovariate(1 / (4 * strength))), 40)
+        assists = min(int(rng.expovariate(1 / (6 * strength))), 40)
+        scored = int(rng.gammavariate(2, 25 * strength))
+        return PlayerStat(
+            pseudo=pseudo,
+            pokemon_id=pokemon,
+            is_opponent=is_opponent,
+            is_bot=is_bot,
+            scored=scored,
+            kills=kills,
+            assists=assists,
+            result=max(1, int(scored + 15 * kills + 10 * assists + rng.gauss(150, 40))),
+        )
+
+    def game(self, date, season):
+        """
+        Generate a game and its ten players, not saved yet.
+
+        :return: A (Game object, list of PlayerStat objects) tuple.
+        """
+
+        rng = self.rng
+        num_bots = rng.randint(1, 5) if rng.random() < self.bot_rate else 0
+        is_won = rng.random() < (0.9 if num_bots else 0.52)
+        is_forfeit = rng.random() < 0.03
+
+        allies = []
+        while len(allies) < 5:
+            pseudo = rng.choices(self.teammates, cum_weights=self.teammate_weights)[0]
+            if pseudo not in allies:
+                allies.append(pseudo)
+        ally_pokemons = self._pick_pokemons([self.favorites[pseudo] for pseudo in allies])
+        opponent_pokemons = self._pick_pokemons()
+
+        # The winning team usually performs better
+        ally_strength, opponent_strength = (1.2, 0.9) if is_won else (0.9, 1.2)
+        players = [self._player(pseudo, pokemon, False, ally_strength)
+                   for pseudo, pokemon in zip(allies, ally_pokemons)]
+        for i, pokemon in enumerate(opponent_pokemons):
+            if i >= 5 - num_bots:  # Bots are named like bulk_import does
+                players.append(self._player(f"BOT_{i}", pokemon, True, 0.5, is_bot=True))
+            else:
+                players.append(self._player(rng.choice(self.opponents), pokemon, True, opponent_strength))
+        # Opponent pseudos must be unique in a game
+        for i, player in enumerate(players[5:]):
+            if any(player.pseudo == other.pseudo for other in players[5 + i + 1:]):
+                player.pseudo = f"{player.pseudo}_{i}"
+
+        score_allies = sum(p.scored for p in players[:5])
+        score_opponents = sum(p.scored for p in players[5:])
+        if is_forfeit or (score_allies > score_opponents) != is_won:
+            score_allies, score_opponents = sorted((score_allies, score_opponents), reverse=not is_won)
+            if score_allies == score_opponents:
+                score_allies += 1 if is_won else -1
+
+        game = Game(date=date, season=season, is_won=is_won, is_forfeit=is_forfeit,
+                    score_allies=max(1, score_allies), score_opponents=max(1, score_opponents))
+
+        for stat in find_mvps(sorted(players, key=lambda p: p.pseudo)):
+            stat.is_mvp = True
+        game.fingerprint = game_fingerprint(date, game.score_allies, game.score_opponents,
+                                            ((p.pseudo, p.pokemon_id, p.is_opponent) for p in players))
+
+        return game, players
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with fake games, to measure the performance of the pages on realistic volumes. The same options
+    (including the seed) always generate the same games, the games already in database being skipped.
+    """
+
+    help = "Generate fake seasons, games and players for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seasons", type=int, default=5, help="Number of seasons.")
+        parser.add_argument("--games", type=int, default=10000, help="Total number of games.")
+        parser.add_argument("--first-season", type=int, default=1, help="Number of the first season.")
+        parser.add_argument("--season-days", type=int, default=90, help="Duration of each season, in days.")
+        parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2021, 7, 21),
+                            help="Start date of the first season (ISO format).")
+        parser.add_argument("--teammates", type=int, default=8, help="Size of the teammate pool (at least 5).")
+        parser.add_argument("--opponents", type=int, default=50000, help="Size of the opponent pool.")
+        parser.add_argument("--bot-rate", type=float, default=0.1, help="Proportion of the games played with bots.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator.")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Number of games inserted per transaction.")
+
+    def handle(self, *args, **options):
+        if options["teammates"] < 5:
+            raise CommandError("At least five teammates are needed")
+        pokemons = sorted(Pokemon.objects.values_list("id", flat=True))
+        if len(pokemons) < 5:
+            raise CommandError("At least five Pokémon are needed, run the migrations first")
+
+        teammates = [f"Joueur{i:02d}" for i in range(options["teammates"])]
+        Teammate.objects.bulk_create([Teammate(pseudo=pseudo) for pseudo in teammates], ignore_conflicts=True)
+
+        generator = Generator(options["seed"], teammates, pokemons, options["bot_rate"], options["opponents"])
+        start = options["start"].replace(tzinfo=options["start"].tzinfo or timezone.utc)
+        began = time.perf_counter()
+
+        num_players = num_skipped = 0
+        for i in range(options["seasons"]):
+            season = Season.objects.get_or_create(number=options["first_season"] + i)[0]
+            num_games = options["games"] // options["seasons"] + (i < options["games"] % options["seasons"])
+            dates = generator.dates(num_games, start + timedelta(days=i * options["season_days"]),
+                                    options["season_days"])
+
+            num_season_skipped = 0
+            for batch in chunked(dates, options["batch_size"]):
+                with transaction.atomic():
+                    # Every game is generated, so that the same options still give the same games when some of them
+                    # are skipped, for instance when the command is run again
+                    generated = [generator.game(date, season) for date in batch]
+                    known = set(Game.objects.filter(fingerprint__in=[game.fingerprint for game, _ in generated])
+                                .values_list("fingerprint", flat=True))
+                    new = []
+                    for game, game_players in generated:
+                        if game.fingerprint not in known:
+                            known.add(game.fingerprint)
+                            new.append((game, game_players))
+                    num_season_skipped += len(generated) - len(new)
+
+                    games = Game.objects.bulk_create([game for game, _ in new])
+                    players = []
+                    for game, (_, game_players) in zip(games, new):
+                        for player in game_players:
+                            player.game = game
+                        players += game_players
+                    PlayerStat.objects.bulk_create(players, batch_size=1000)
+                num_players += len(players)
+
+            num_skipped += num_season_skipped
+            self.stdout.write(f"Season {season.number}: {num_games - num_season_skipped} games, "
+                              f"{num_season_skipped} already present")
+
+        # Bulk inserts don't send any signal
+        rollups.rebuild()
+        cache.delete_many([stats_cache.games_count_key()] + [
+            stats_cache.games_count_key(options["first_season"] + i) for i in range(options["seasons"])
+        ])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['games'] - num_skipped} games and {num_players} players in "
+            f"{time.perf_counter() - began:.1f} s, skipped {num_skipped} games already present"
+        ))
@@ -0,0 +1,142 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from stats.models import Game, Season
+from stats.utils import IMPORT_BATCH_SIZE, BulkImportError, chunked, count_dump_games, insert_games, \
+    load_scrape_names, parse_dump
+
+# Number of errors displayed per invalid file
+MAX_ERRORS = 5
+
+
+def parse_file(path, season, names):
+    """
+    Parse a whole scraper dump, in a worker process.
+
+    :param path: Path of the dump.
+    :param season: Season of the games.
+    :param names: Names returned by load_scrape_names.
+    :return: A (list of (Game object, list of PlayerStat objects) tuples, list of (line number, message) errors) tuple.
+    """
+
+    with open(path, "rb") as fp:
+        try:
+            num_games = count_dump_games(fp)
+        except BulkImportError as e:
+            return [], e.errors
+
+        parsed, errors = [], []
+        for game, players, game_errors in parse_dump(fp, num_games, season, names):
+            parsed.append((game, players))
+            errors += game_errors
+    return parsed, errors
+
+
+def count_new(parsed):
+    """
+    Count the games that would be inserted by utils.insert_games, without inserting anything.
+
+    :param parsed: An iterable of (Game object, list of PlayerStat objects) tuples.
+    :return: A (number of new games, number of games already present) tuple.
+    """
+
+    num_new = num_known = 0
+    seen = set()
+    for batch in chunked(parsed, IMPORT_BATCH_SIZE):
+        fingerprints = [game.fingerprint for game, _ in batch]
+        seen |= set(Game.objects.filter(fingerprint__in=fingerprints).values_list("fingerprint", flat=True))
+        for fingerprint in fingerprints:
+            if fingerprint in seen:
+                num_known += 1
+            else:
+                num_new += 1
+                seen.add(fingerprint)
+    return num_new, num_known
+
+
+class Command(BaseCommand):
+    """
+    Import many Web Scraper dumps at once, e.g. every export of a season. The files are parsed in parallel by a process
+    pool, with the same parsing and validation as the admin import, and the games of the valid files are inserted in
+    batched transactions while the next files are parsed. A file with an invalid line isn't imported at all.
+    """
+
+    help = "Import Web Scraper csv exports from uniteapi.dev."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", type=Path, help="Csv files, or directories containing csv files.")
+        parser.add_argument("--season", type=int, required=True, help="Season of the games.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of parsing processes.")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Number of games inserted per transaction.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Parse and validate the files, and count the new games without inserting them.")
+
+    def handle(self, *args, **options):
+        try:
+            season = Season.objects.get(number=options["season"])
+        except Season.DoesNotExist:
+            raise CommandError(f"Season {options['season']} doesn't exist")
+
+        files = []
+        for path in options["paths"]:
+            if path.is_dir():
+                files += sorted(path.glob("*.csv"))
+            elif path.is_file():
+                files.append(path)
+            else:
+                raise CommandError(f"{path} doesn't exist")
+        if not files:
+            raise CommandError("No csv file to import")
+
+        names = load_scrape_names()
+        invalid = []
+        num_parsed = 0
+
+        def valid_games(results):
+            """
+            Report every parsed file in order, and yield the games of the valid ones.
+            """
+
+            nonlocal num_parsed
+            for path, (parsed, errors) in zip(files, results):
+                if errors:
+                    invalid.append(path)
+                    self.stdout.write(self.style.ERROR(f"{path}: {len(errors)} error(s)"))
+                    for message in BulkImportError(errors[:MAX_ERRORS]).messages:
+                        self.stdout.write(f"    {message}")
+                    if len(errors) > MAX_ERRORS:
+                        self.stdout.write(f"    ... and {len(errors) - MAX_ERRORS} more")
+                    continue
+                self.stdout.write(f"{path}: {len(parsed)} games")
+                num_parsed += len(parsed)
+                yield from parsed
+
+        # The workers don't use the database, but mustn't inherit its connections
+        connections.close_all()
+        began = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=django.setup) as executor:
+            results = executor.map(parse_file, files, [season] * len(files), [names] * len(files))
+            if options["dry_run"]:
+                num_inserted, num_skipped = count_new(valid_games(results))
+            else:
+                num_inserted = num_skipped = 0
+                for chunk in chunked(valid_games(results), options["chunk_size"]):
+                    with transaction.atomic():
+                        inserted, skipped = insert_games(chunk, season)
+                    num_inserted += inserted
+                    num_skipped += skipped
+        elapsed = time.perf_counter() - began
+
+        self.stdout.write(
+            f"{len(files)} files, {num_parsed} valid games in {elapsed:.2f} s ({num_parsed / elapsed:.0f} games/s): "
+            f"{num_inserted} {'to insert' if options['dry_run'] else 'inserted'}, {num_skipped} already present"
+        )
+        if invalid:
+            raise CommandError(f"{len(invalid)} file(s) couldn't be imported")
+        self.stdout.write(self.style.SUCCESS("Dry run, nothing was imported" if options["dry_run"] else "Done"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from stats import rollups
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the rollup tables used by the statistics pages from the games and player stats.
+    """
+
+    help = "Rebuild the pre-aggregated statistics from scratch."
+
+    def handle(self, *args, **options):
+        num_games, num_players = rollups.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {num_games} game rollup{'s' if num_games != 1 else ''} "
+            f"and {num_players} player rollup{'s' if num_players != 1 else ''}"
+        ))
@@ -0,0 +1,58 @@
+"""
+Middlewares of the stats app.
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import instrumentation
+
+logger = logging.getLogger("stats.requests")
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Measure the number of SQL queries, the database time, the template rendering time and the total time of each
+    request. They are logged as structured fields (the "props" of the record, see docker/logging.conf), and sent to
+    staff users in a Server-Timing header, that the browser developer tools display along with the request.
+
+    It should be the first middleware, so that the total time includes the other ones.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics, token = instrumentation.start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        total_time = time.perf_counter() - start
+
+        logger.info("%s %s %s", request.method, request.path, response.status_code, extra={"props": {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "sql_queries": metrics.num_queries,
+            "db_time_ms": round(1000 * metrics.db_time, 2),
+            "template_time_ms": round(1000 * metrics.template_time, 2),
+            "total_time_ms": round(1000 * total_time, 2),
+        }})
+
+        user = getattr(request, "user", None)
+        if user is not None and user.is_staff:
+            response["Server-Timing"] = ", ".join((
+                f'db;dur={1000 * metrics.db_time:.2f};desc="{metrics.num_queries} SQL"',
+                f"tpl;dur={1000 * metrics.template_time:.2f}",
+                f"total;dur={1000 * total_time:.2f}",
+            ))
+
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+def fill_mvps(apps, schema_editor):
+    """
+    Flag the MVP of each team of the existing games: the player with the highest mark, or the highest scored points if
+    there's a draw, or the last player by pseudo if nobody scored anything. This is a frozen copy of utils.find_mvps.
+    """
+
+    PlayerStat = apps.get_model("stats", "PlayerStat")
+
+    mvp_ids = []
+    best = {}  # {(game ID, is opponent): (result, scored, player stat ID)}
+    last = {}  # {(game ID, is opponent): player stat ID}
+    for stat_id, game_id, is_opponent, result, scored in PlayerStat.objects.order_by("game_id", "pseudo").values_list(
+        "id", "game_id", "is_opponent", "result", "scored"
+    ).iterator(chunk_size=2000):
+        team = (game_id, is_opponent)
+        last[team] = stat_id
+        mvp_result, mvp_scored, _ = best.get(team, (0, 0, None))
+        if result > mvp_result or (result == mvp_result and scored > mvp_scored):
+            best[team] = (result, scored, stat_id)
+
+    for team, stat_id in last.items():
+        mvp_ids.append(best[team][2] if team in best else stat_id)
+    for start in range(0, len(mvp_ids), 500):
+        PlayerStat.objects.filter(id__in=mvp_ids[start:start + 500]).update(is_mvp=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0004_game_date_id_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstat',
+            name='is_mvp',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='MVP'),
+        ),
+        migrations.RunPython(fill_mvps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Aggregate the existing games into the new rollup tables. This is a frozen copy of rollups.rebuild, as of this
+    migration.
+    """
+
+    Game = apps.get_model("stats", "Game")
+    GameRollup = apps.get_model("stats", "GameRollup")
+    PlayerStat = apps.get_model("stats", "PlayerStat")
+    PlayerStatRollup = apps.get_model("stats", "PlayerStatRollup")
+
+    game_rows = Game.objects.annotate(day=TruncDate("date")).values("season_id", "day").annotate(
+        num_games=Count("id"),
+        num_won=Count("id", filter=Q(is_won=True)),
+    ).order_by()
+    GameRollup.objects.bulk_create((GameRollup(**row) for row in game_rows), batch_size=500)
+
+    player_rows = PlayerStat.objects.annotate(
+        season_id=F("game__season_id"),
+        day=TruncDate("game__date"),
+        rollup_pseudo=Case(When(is_opponent=True, then=Value("")), default=F("pseudo")),
+    ).values("season_id", "day", "rollup_pseudo", "is_opponent", "pokemon_id").annotate(
+        num_games=Count("id"),
+        num_won=Count("id", filter=Q(game__is_won=True)),
+        num_mvp=Count("id", filter=Q(is_mvp=True)),
+        sum_scored=Sum("scored"),
+        sum_kills=Sum("kills"),
+        sum_assists=Sum("assists"),
+        sum_result=Sum("result"),
+    ).order_by()
+    PlayerStatRollup.objects.bulk_create(
+        (PlayerStatRollup(pseudo=row.pop("rollup_pseudo"), **row) for row in player_rows), batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0005_playerstat_is_mvp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('num_games', models.PositiveIntegerField(default=0, verbose_name='Parties jouées')),
+                ('num_won', models.PositiveIntegerField(default=0, verbose_name='Parties gagnées')),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stats.season')),
+            ],
+            options={
+                'verbose_name': 'Agrégat de parties',
+                'constraints': [models.UniqueConstraint(fields=('season', 'day'), name='unique_game_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerStatRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('pseudo', models.CharField(blank=True, max_length=64, verbose_name='Pseudo')),
+                ('is_opponent', models.BooleanField(verbose_name='Joueur adverse')),
+                ('num_games', models.PositiveIntegerField(default=0, verbose_name='Parties jouées')),
+                ('num_won', models.PositiveIntegerField(default=0, verbose_name='Parties gagnées')),
+                ('num_mvp', models.PositiveIntegerField(default=0, verbose_name='Nombre de MVP')),
+                ('sum_scored', models.PositiveBigIntegerField(default=0, verbose_name='Total des points marqués')),
+                ('sum_kills', models.PositiveBigIntegerField(default=0, verbose_name='Total des KOs')),
+                ('sum_assists', models.PositiveBigIntegerField(default=0, verbose_name='Total des assists')),
+                ('sum_result', models.PositiveBigIntegerField(default=0, verbose_name='Total des notes globales')),
+                ('pokemon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stats.pokemon')),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stats.season')),
+            ],
+            options={
+                'verbose_name': 'Agrégat de joueurs',
+                'constraints': [models.UniqueConstraint(fields=('season', 'day', 'pseudo', 'is_opponent', 'pokemon'), name='unique_playerstat_rollup')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:35
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+
+def fill_won_stats(apps, schema_editor):
+    """
+    Fill the won games totals of the existing player rollups. This is a frozen copy of the won/lost split of
+    rollups.rebuild, as of this migration.
+    """
+
+    PlayerStat = apps.get_model("stats", "PlayerStat")
+    PlayerStatRollup = apps.get_model("stats", "PlayerStatRollup")
+
+    won_rows = PlayerStat.objects.filter(game__is_won=True).annotate(
+        season_id=F("game__season_id"),
+        day=TruncDate("game__date"),
+        rollup_pseudo=Case(When(is_opponent=True, then=Value("")), default=F("pseudo")),
+    ).values("season_id", "day", "rollup_pseudo", "is_opponent", "pokemon_id").annotate(
+        won_num_mvp=Count("id", filter=Q(is_mvp=True)),
+        won_sum_scored=Sum("scored"),
+        won_sum_kills=Sum("kills"),
+        won_sum_assists=Sum("assists"),
+        won_sum_result=Sum("result"),
+    ).order_by()
+
+    rollups = {
+        (rollup.season_id, rollup.day, rollup.pseudo, rollup.is_opponent, rollup.pokemon_id): rollup
+        for rollup in PlayerStatRollup.objects.all()
+    }
+    for row in won_rows:
+        rollup = rollups[(row.pop("season_id"), row.pop("day"), row.pop("rollup_pseudo"), row.pop("is_opponent"),
+                          row.pop("pokemon_id"))]
+        for field, value in row.items():
+            setattr(rollup, field, value)
+    PlayerStatRollup.objects.bulk_update(rollups.values(), [
+        "won_num_mvp", "won_sum_scored", "won_sum_kills", "won_sum_assists", "won_sum_result"
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0006_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstatrollup',
+            name='won_num_mvp',
+            field=models.PositiveIntegerField(default=0, verbose_name='Nombre de MVP (victoires)'),
+        ),
+        migrations.AddField(
+            model_name='playerstatrollup',
+            name='won_sum_assists',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Total des assists (victoires)'),
+        ),
+        migrations.AddField(
+            model_name='playerstatrollup',
+            name='won_sum_kills',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Total des KOs (victoires)'),
+        ),
+        migrations.AddField(
+            model_name='playerstatrollup',
+            name='won_sum_result',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Total des notes globales (victoires)'),
+        ),
+        migrations.AddField(
+            model_name='playerstatrollup',
+            name='won_sum_scored',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Total des points marqués (victoires)'),
+        ),
+        migrations.RunPython(fill_won_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:38
+
+from django.db import migrations, models
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+
+def flag_bots(apps, schema_editor):
+    """
+    Bots were imported as opponents named BOT_0 to BOT_4, flag them with a single UPDATE.
+    """
+
+    PlayerStat = apps.get_model("stats", "PlayerStat")
+    PlayerStat.objects.filter(is_opponent=True, pseudo__regex=r"^BOT_[0-9]+$").update(is_bot=True)
+
+
+def rebuild_rollups(apps, schema_editor):
+    """
+    Rebuild the rollups, now split between the games with and without bots. This is a frozen copy of rollups.rebuild,
+    as of this migration.
+    """
+
+    Game = apps.get_model("stats", "Game")
+    GameRollup = apps.get_model("stats", "GameRollup")
+    PlayerStat = apps.get_model("stats", "PlayerStat")
+    PlayerStatRollup = apps.get_model("stats", "PlayerStatRollup")
+
+    GameRollup.objects.all().delete()
+    PlayerStatRollup.objects.all().delete()
+
+    game_rows = Game.objects.annotate(
+        day=TruncDate("date"),
+        with_bots=Exists(PlayerStat.objects.filter(game_id=OuterRef("pk"), is_bot=True)),
+    ).values("season_id", "day", "with_bots").annotate(
+        num_games=Count("id"),
+        num_won=Count("id", filter=Q(is_won=True)),
+    ).order_by()
+    GameRollup.objects.bulk_create((GameRollup(**row) for row in game_rows), batch_size=500)
+
+    player_rows = PlayerStat.objects.annotate(
+        season_id=F("game__season_id"),
+        day=TruncDate("game__date"),
+        with_bots=Exists(PlayerStat.objects.filter(game_id=OuterRef("game_id"), is_bot=True)),
+        rollup_pseudo=Case(When(is_opponent=True, then=Value("")), default=F("pseudo")),
+    ).values("season_id", "day", "with_bots", "rollup_pseudo", "is_opponent", "pokemon_id").annotate(
+        num_games=Count("id"),
+        num_won=Count("id", filter=Q(game__is_won=True)),
+        num_mvp=Count("id", filter=Q(is_mvp=True)),
+        sum_scored=Sum("scored"),
+        sum_kills=Sum("kills"),
+        sum_assists=Sum("assists"),
+        sum_result=Sum("result"),
+        won_num_mvp=Count("id", filter=Q(is_mvp=True, game__is_won=True)),
+        won_sum_scored=Sum("scored", filter=Q(game__is_won=True), default=0),
+        won_sum_kills=Sum("kills", filter=Q(game__is_won=True), default=0),
+        won_sum_assists=Sum("assists", filter=Q(game__is_won=True), default=0),
+        won_sum_result=Sum("result", filter=Q(game__is_won=True), default=0),
+    ).order_by()
+    PlayerStatRollup.objects.bulk_create(
+        (PlayerStatRollup(pseudo=row.pop("rollup_pseudo"), **row) for row in player_rows), batch_size=500
+    )
+
+
+def empty_rollups(apps, schema_editor):
+    """
+    Delete the rollups split between the games with and without bots, which wouldn't fit the previous constraints. They
+    have to be rebuilt with the rebuild_rollups command if the migration isn't applied again.
+    """
+
+    apps.get_model("stats", "GameRollup").objects.all().delete()
+    apps.get_model("stats", "PlayerStatRollup").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0007_playerstatrollup_won'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='gamerollup',
+            name='unique_game_rollup',
+        ),
+        migrations.RemoveConstraint(
+            model_name='playerstatrollup',
+            name='unique_playerstat_rollup',
+        ),
+        migrations.AddField(
+            model_name='gamerollup',
+            name='with_bots',
+            field=models.BooleanField(default=False, verbose_name='Parties avec des bots'),
+        ),
+        migrations.AddField(
+            model_name='playerstat',
+            name='is_bot',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Bot'),
+        ),
+        migrations.AddField(
+            model_name='playerstatrollup',
+            name='with_bots',
+            field=models.BooleanField(default=False, verbose_name='Parties avec des bots'),
+        ),
+        migrations.AddConstraint(
+            model_name='gamerollup',
+            constraint=models.UniqueConstraint(fields=('season', 'day', 'with_bots'), name='unique_game_rollup_bots'),
+        ),
+        migrations.AddConstraint(
+            model_name='playerstatrollup',
+            constraint=models.UniqueConstraint(fields=('season', 'day', 'with_bots', 'pseudo', 'is_opponent', 'pokemon'), name='unique_playerstat_rollup_bots'),
+        ),
+        migrations.RunPython(flag_bots, migrations.RunPython.noop),
+        migrations.RunPython(rebuild_rollups, empty_rollups),
+    ]
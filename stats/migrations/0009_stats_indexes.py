@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0008_playerstat_is_bot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playerstat',
+            index=models.Index(condition=models.Q(('is_opponent', False)), fields=['pseudo', 'game'], name='playerstat_ally_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playerstat',
+            index=models.Index(condition=models.Q(('is_opponent', True)), fields=['pokemon', 'game'], name='playerstat_opponent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playerstatrollup',
+            index=models.Index(condition=models.Q(('is_opponent', False)), fields=['pseudo', 'season', 'day'], name='rollup_ally_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playerstatrollup',
+            index=models.Index(condition=models.Q(('is_opponent', True)), fields=['pokemon', 'season'], name='rollup_opponent_idx'),
+        ),
+    ]
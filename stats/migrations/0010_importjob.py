@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0009_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('csv_file', models.FileField(upload_to='imports/', verbose_name='Fichier .csv de scraping')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], db_index=True, default='pending', max_length=16, verbose_name='Statut')),
+                ('num_games', models.PositiveIntegerField(blank=True, null=True, verbose_name='Parties dans le fichier')),
+                ('num_parsed', models.PositiveIntegerField(default=0, verbose_name='Parties validées')),
+                ('num_inserted', models.PositiveIntegerField(default=0, verbose_name='Parties importées')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Erreurs')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarré le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('season', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stats.season', verbose_name='Saison')),
+            ],
+            options={
+                'verbose_name': 'Import de parties',
+                'verbose_name_plural': 'Imports de parties',
+            },
+        ),
+    ]
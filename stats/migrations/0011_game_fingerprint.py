@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:00
+
+import hashlib
+from datetime import timezone
+
+from django.db import migrations, models
+
+
+def game_fingerprint(date, score_allies, score_opponents, players):
+    """
+    Frozen copy of utils.game_fingerprint as of this migration, so that the migration always computes the same
+    fingerprints.
+    """
+
+    if date.utcoffset() is not None:
+        date = date.astimezone(timezone.utc)
+    key = [date.strftime("%Y-%m-%dT%H:%M"), score_allies, score_opponents,
+           sorted([pseudo, pokemon, bool(is_opponent)] for pseudo, pokemon, is_opponent in players)]
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    """
+    Compute the fingerprint of the existing games, by batches of primary keys. Games duplicating an earlier one keep no
+    fingerprint, since the column is unique, and neither do the games without players. They are counted so that they
+    can be checked by hand.
+    """
+
+    Game = apps.get_model("stats", "Game")
+    PlayerStat = apps.get_model("stats", "PlayerStat")
+
+    known = set()
+    num_duplicates = num_empty = 0
+    pks = list(Game.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(pks), 2000):
+        games = list(Game.objects.filter(pk__in=pks[start:start + 2000]).order_by("pk"))
+        players = {}
+        for game_id, *player in PlayerStat.objects.filter(game__in=games).values_list(
+            "game_id", "pseudo", "pokemon_id", "is_opponent"
+        ):
+            players.setdefault(game_id, []).append(player)
+
+        for game in games:
+            if game.pk not in players:  # No player, the game will get its fingerprint once they are entered
+                num_empty += 1
+                continue
+            fingerprint = game_fingerprint(game.date, game.score_allies, game.score_opponents, players[game.pk])
+            if fingerprint in known:
+                num_duplicates += 1
+            else:
+                known.add(fingerprint)
+                game.fingerprint = fingerprint
+        Game.objects.bulk_update(games, ["fingerprint"])
+
+    if num_duplicates or num_empty:
+        print(f"\n  {num_duplicates} duplicated game(s) and {num_empty} game(s) without players left without "
+              "fingerprint, they won't be detected as duplicates")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0010_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, unique=True, verbose_name='Empreinte'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='num_skipped',
+            field=models.PositiveIntegerField(default=0, verbose_name='Parties déjà présentes'),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
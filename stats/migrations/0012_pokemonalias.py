@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Names of the image urls of uniteapi.dev that don't match ours, indexed by the name of the Pokémon
+UNITEAPI_ALIASES = {
+    "meowscarada": ["meowscara"],
+    "alolan ninetales": ["ninetales"],
+    "mewtwo x": ["mewtwox"],
+    "mewtwo y": ["mewtwoy"],
+    "urshifu": ["urshifu_rapid", "urshifu_single"],
+    "mr. mime": ["mrmime"],
+}
+
+
+def add_aliases(apps, schema_editor):
+    """
+    Move the uniteapi.dev quirks that were hardcoded in bulk_import to the table, for the Pokémon that exist.
+    """
+
+    Pokemon = apps.get_model("stats", "Pokemon")
+    PokemonAlias = apps.get_model("stats", "PokemonAlias")
+    PokemonAlias.objects.bulk_create([
+        PokemonAlias(source="uniteapi", alias=alias, pokemon=pokemon)
+        for pokemon in Pokemon.objects.all() for alias in UNITEAPI_ALIASES.get(pokemon.name.lower(), [])
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0011_game_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PokemonAlias',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('uniteapi', 'uniteapi.dev')], default='uniteapi', max_length=16, verbose_name='Source')),
+                ('alias', models.CharField(help_text='En minuscules.', max_length=64, verbose_name='Alias')),
+                ('pokemon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stats.pokemon')),
+            ],
+            options={
+                'verbose_name': 'Alias de Pokémon',
+                'verbose_name_plural': 'Alias de Pokémon',
+                'constraints': [models.UniqueConstraint(fields=('source', 'alias'), name='unique_pokemon_alias')],
+            },
+        ),
+        migrations.RunPython(add_aliases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Names of the scraper dumps that were hardcoded in bulk_import, indexed by pseudo
+ALIASES = {
+    "Renn_Kane": ["FCS_RennKane"],
+    "AliceCheshir": ["FCS_Alice"],
+}
+
+
+def add_aliases(apps, schema_editor):
+    """
+    Move the renames that were hardcoded in bulk_import to the table, for the teammates that exist.
+    """
+
+    Teammate = apps.get_model("stats", "Teammate")
+    TeammateAlias = apps.get_model("stats", "TeammateAlias")
+    TeammateAlias.objects.bulk_create([
+        TeammateAlias(alias=alias, teammate=teammate)
+        for teammate in Teammate.objects.filter(pseudo__in=ALIASES) for alias in ALIASES[teammate.pseudo]
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0012_pokemonalias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeammateAlias',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=64, unique=True, verbose_name='Alias')),
+                ('teammate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stats.teammate', verbose_name='Coéquipier')),
+            ],
+            options={
+                'verbose_name': 'Alias de coéquipier',
+                'verbose_name_plural': 'Alias de coéquipiers',
+            },
+        ),
+        migrations.RunPython(add_aliases, migrations.RunPython.noop),
+    ]
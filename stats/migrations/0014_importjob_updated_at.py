@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:54
+
+from django.db import migrations, models
+
+
+def start_heartbeats(apps, schema_editor):
+    """
+    Start the heartbeat of the jobs already running at their start date, so that they are still recovered if they were
+    interrupted.
+    """
+
+    ImportJob = apps.get_model("stats", "ImportJob")
+    ImportJob.objects.filter(status="running").update(updated_at=models.F("started_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0013_teammatealias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Mis à jour le'),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
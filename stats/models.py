@@ -28,6 +28,11 @@ class Game(models.Model):
     class Meta:
         verbose_name = "Partie"
         get_latest_by = "date"
+        indexes = [
+            # Back the keyset pagination of the games list, with or without a season filter
+            models.Index(fields=["date", "id"], name="game_date_id_idx"),
+            models.Index(fields=["season", "date", "id"], name="game_season_date_id_idx"),
+        ]
 
     date = models.DateTimeField("Date du match")
     season = models.ForeignKey(Season, on_delete=models.PROTECT)
@@ -35,6 +40,8 @@ class Game(models.Model):
     is_forfeit = models.BooleanField("Forfait", default=False)
     score_allies = models.PositiveIntegerField("Score allié")
     score_opponents = models.PositiveIntegerField("Score opposants")
+    # Natural key of the game, see utils.game_fingerprint. Games entered before their players have none
+    fingerprint = models.CharField("Empreinte", max_length=40, unique=True, null=True, blank=True, editable=False)
 
     def __str__(self):
         return "Partie du {} ({})".format(
@@ -61,6 +68,33 @@ class Pokemon(models.Model):
         return "{} ({})".format(self.name, self.get_category_display())
 
 
+class PokemonAlias(models.Model):
+    """
+    Name given to a Pokémon by an external source, e.g. in the image urls of uniteapi.dev. Aliases are resolved by
+    stats.aliases, the names and IDs of the Pokémon being aliases of every source already.
+    """
+
+    UNITEAPI = "uniteapi"
+
+    class Meta:
+        verbose_name = "Alias de Pokémon"
+        verbose_name_plural = "Alias de Pokémon"
+        constraints = [
+            models.UniqueConstraint(fields=["source", "alias"], name="unique_pokemon_alias")
+        ]
+
+    source = models.CharField("Source", max_length=16, default=UNITEAPI, choices=[(UNITEAPI, "uniteapi.dev")])
+    alias = models.CharField("Alias", max_length=64, help_text="En minuscules.")
+    pokemon = models.ForeignKey(Pokemon, on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"{self.alias} ({self.get_source_display()})"
+
+    def save(self, *args, **kwargs):
+        self.alias = self.alias.lower()
+        super().save(*args, **kwargs)
+
+
 def restrict_amount(value):
     """
     Validates the number of players in a game.
@@ -85,6 +119,13 @@ class PlayerStat(models.Model):
             models.UniqueConstraint(fields=["game", "pseudo"], name="no_duplicate_players"),
             models.UniqueConstraint(fields=["game", "pokemon", "is_opponent"], name="no_duplicate_pokemons_in_team")
         ]
+        indexes = [
+            # Players of the team (or a given teammate), and opponents grouped by Pokémon. Boolean columns can't lead
+            # an index on SQLite (a filter on them isn't an equality), so the team is the condition of partial indexes
+            models.Index(fields=["pseudo", "game"], condition=models.Q(is_opponent=False), name="playerstat_ally_idx"),
+            models.Index(fields=["pokemon", "game"], condition=models.Q(is_opponent=True),
+                         name="playerstat_opponent_idx"),
+        ]
 
     game = models.ForeignKey(Game, on_delete=models.CASCADE, validators=[restrict_amount])
     pseudo = models.CharField("Pseudo", max_length=64)
@@ -94,6 +135,8 @@ class PlayerStat(models.Model):
     kills = models.PositiveIntegerField("Nombre de KOs")
     assists = models.PositiveIntegerField("Nombre d'assists")
     result = models.PositiveIntegerField("Note globale")
+    is_mvp = models.BooleanField("MVP", default=False, db_index=True)
+    is_bot = models.BooleanField("Bot", default=False, db_index=True)
 
     def __str__(self):
         return "{}: {}({}) S{}/K{}/A{}/{}".format(
@@ -107,10 +150,14 @@ class PlayerStat(models.Model):
         )
 
     def clean(self):
-        # If a player is an ally, check that it exists in the Teammate model
+        # If a player is an ally, check that it's a teammate, and replace their alias with their pseudo
         if not self.is_opponent:
-            if len(Teammate.objects.filter(pseudo=self.pseudo)) == 0:
+            from .aliases import resolve_teammate
+
+            pseudo = resolve_teammate(self.pseudo)
+            if pseudo is None:
                 raise ValidationError("{}: ce coéquipier n'existe pas.".format(self.pseudo))
+            self.pseudo = pseudo
 
 
 class Teammate(models.Model):
@@ -125,3 +172,119 @@ class Teammate(models.Model):
 
     def __str__(self):
         return self.pseudo
+
+
+class TeammateAlias(models.Model):
+    """
+    Another name of a teammate, in-game or in the scraper dumps. Aliases are resolved by stats.aliases.
+    """
+
+    class Meta:
+        verbose_name = "Alias de coéquipier"
+        verbose_name_plural = "Alias de coéquipiers"
+
+    alias = models.CharField("Alias", max_length=64, unique=True)
+    teammate = models.ForeignKey(Teammate, on_delete=models.CASCADE, verbose_name="Coéquipier")
+
+    def __str__(self):
+        return self.alias
+
+
+class GameRollup(models.Model):
+    """
+    Number of games played and won, per season, day and presence of bots. It is maintained by stats.rollups and can be
+    rebuilt at any time from the Game table.
+    """
+
+    class Meta:
+        verbose_name = "Agrégat de parties"
+        constraints = [
+            models.UniqueConstraint(fields=["season", "day", "with_bots"], name="unique_game_rollup_bots")
+        ]
+
+    season = models.ForeignKey(Season, on_delete=models.CASCADE)
+    day = models.DateField("Jour")
+    with_bots = models.BooleanField("Parties avec des bots", default=False)
+    num_games = models.PositiveIntegerField("Parties jouées", default=0)
+    num_won = models.PositiveIntegerField("Parties gagnées", default=0)
+
+
+class PlayerStatRollup(models.Model):
+    """
+    Sums and counts of the player stats, per season, day, presence of bots, player, team and Pokémon. It is maintained
+    by stats.rollups and can be rebuilt at any time from the PlayerStat table.
+
+    Opponents are only tracked per Pokémon, their pseudo is left empty to keep the table small.
+    """
+
+    class Meta:
+        verbose_name = "Agrégat de joueurs"
+        constraints = [
+            models.UniqueConstraint(fields=["season", "day", "with_bots", "pseudo", "is_opponent", "pokemon"],
+                                    name="unique_playerstat_rollup_bots")
+        ]
+        indexes = [
+            # Allies per pseudo (grouped by season or day), and opponents grouped by Pokémon
+            models.Index(fields=["pseudo", "season", "day"], condition=models.Q(is_opponent=False),
+                         name="rollup_ally_idx"),
+            models.Index(fields=["pokemon", "season"], condition=models.Q(is_opponent=True), name="rollup_opponent_idx"),
+        ]
+
+    season = models.ForeignKey(Season, on_delete=models.CASCADE)
+    day = models.DateField("Jour")
+    with_bots = models.BooleanField("Parties avec des bots", default=False)
+    pseudo = models.CharField("Pseudo", max_length=64, blank=True)
+    is_opponent = models.BooleanField("Joueur adverse")
+    pokemon = models.ForeignKey(Pokemon, on_delete=models.CASCADE)
+    num_games = models.PositiveIntegerField("Parties jouées", default=0)
+    num_won = models.PositiveIntegerField("Parties gagnées", default=0)
+    num_mvp = models.PositiveIntegerField("Nombre de MVP", default=0)
+    sum_scored = models.PositiveBigIntegerField("Total des points marqués", default=0)
+    sum_kills = models.PositiveBigIntegerField("Total des KOs", default=0)
+    sum_assists = models.PositiveBigIntegerField("Total des assists", default=0)
+    sum_result = models.PositiveBigIntegerField("Total des notes globales", default=0)
+    # Same counters restricted to the won games, those of the lost games are derived from both
+    won_num_mvp = models.PositiveIntegerField("Nombre de MVP (victoires)", default=0)
+    won_sum_scored = models.PositiveBigIntegerField("Total des points marqués (victoires)", default=0)
+    won_sum_kills = models.PositiveBigIntegerField("Total des KOs (victoires)", default=0)
+    won_sum_assists = models.PositiveBigIntegerField("Total des assists (victoires)", default=0)
+    won_sum_result = models.PositiveBigIntegerField("Total des notes globales (victoires)", default=0)
+
+
+class ImportJob(models.Model):
+    """
+    Import of a Web Scraper dump, run in the background by stats.jobs. The table is the queue of the jobs: they are
+    processed one at a time, oldest first. The uploaded file is deleted once the job is finished.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    class Meta:
+        verbose_name = "Import de parties"
+        verbose_name_plural = "Imports de parties"
+
+    csv_file = models.FileField("Fichier .csv de scraping", upload_to="imports/")
+    season = models.ForeignKey(Season, on_delete=models.CASCADE, verbose_name="Saison")
+    status = models.CharField("Statut", max_length=16, default=PENDING, db_index=True, choices=[
+        (PENDING, "En attente"), (RUNNING, "En cours"), (DONE, "Terminé"), (FAILED, "Échec")
+    ])
+    num_games = models.PositiveIntegerField("Parties dans le fichier", null=True, blank=True)
+    num_parsed = models.PositiveIntegerField("Parties validées", default=0)
+    num_inserted = models.PositiveIntegerField("Parties importées", default=0)
+    num_skipped = models.PositiveIntegerField("Parties déjà présentes", default=0)
+    errors = models.JSONField("Erreurs", default=list, blank=True)
+    created_at = models.DateTimeField("Créé le", auto_now_add=True)
+    started_at = models.DateTimeField("Démarré le", null=True, blank=True)
+    finished_at = models.DateTimeField("Terminé le", null=True, blank=True)
+    # Refreshed by the worker every time it saves the progress of the job
+    updated_at = models.DateTimeField("Mis à jour le", null=True, blank=True)
+
+    def __str__(self):
+        return "Import du {} ({})".format(self.created_at.strftime("%d/%m/%Y à %H:%M"), self.get_status_display())
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
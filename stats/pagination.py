@@ -0,0 +1,115 @@
+"""
+Pagination helpers for the games list.
+"""
+
+from datetime import datetime
+from functools import cached_property
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+# How long the approximate number of games is kept in cache, in seconds
+COUNT_CACHE_TIMEOUT = 300
+
+
+class CachedCountPaginator(Paginator):
+    """
+    A Paginator that caches the total number of objects instead of running a COUNT(*) for every page. The total may
+    thus be slightly outdated, which is acceptable to display the number of pages.
+    """
+
+    def __init__(self, *args, cache_key, **kwargs):
+        self.cache_key = cache_key
+
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        return cache.get_or_set(self.cache_key, lambda: Paginator.count.func(self), COUNT_CACHE_TIMEOUT)
+
+
+class KeysetPage:
+    """
+    A page of games retrieved with keyset (seek) pagination. Games are sorted by descending (date, id), and the page
+    boundaries are given by the cursor of the first and last game of the page.
+    """
+
+    def __init__(self, object_list, has_previous, has_next):
+        self.object_list = object_list
+        self.has_previous = has_previous
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous and self.object_list else None
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next and self.object_list else None
+
+
+def encode_cursor(game):
+    """
+    Get the cursor of a game, to be used in an URL.
+
+    :param game: A Game object.
+    :return: The cursor, as a string.
+    """
+
+    return f"{game.date.isoformat()},{game.pk}"
+
+
+def decode_cursor(value):
+    """
+    Parse a cursor created by encode_cursor.
+
+    :param value: The cursor, as a string.
+    :return: A (date, id) tuple, or None if the cursor is invalid.
+    """
+
+    try:
+        date, pk = value.rsplit(",", 1)
+        return datetime.fromisoformat(date), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_paginate(games, per_page, after=None, before=None):
+    """
+    Retrieve a page of games, sorted by descending date, without counting or skipping rows. Only one query is run, and
+    it is backed by the (date, id) index of the Game model.
+
+    :param games: Game queryset, eventually filtered but not ordered.
+    :param per_page: Number of games per page.
+    :param after: Cursor of the game right before the page, to get the next page.
+    :param before: Cursor of the game right after the page, to get the previous page.
+    :return: A KeysetPage object.
+    """
+
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+
+    if before:
+        date, pk = before
+        games = games.filter(Q(date__gt=date) | Q(date=date, id__gt=pk)).order_by("date", "id")
+    else:
+        if after:
+            date, pk = after
+            games = games.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+        games = games.order_by("-date", "-id")
+
+    # Fetch one more game to know if there is another page further
+    object_list = list(games[:per_page + 1])
+    has_more = len(object_list) > per_page
+    object_list = object_list[:per_page]
+
+    if before:
+        return KeysetPage(object_list[::-1], has_previous=has_more, has_next=True)
+    return KeysetPage(object_list, has_previous=after is not None, has_next=has_more)
@@ -0,0 +1,367 @@
+"""
+Statistics engine used by the team and player pages. Every statistic is computed from the rollup tables with as few
+queries as possible: the rows are grouped by the database, then folded in Python into the different tables.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+
+from . import cache as stats_cache
+from .models import GameRollup, PlayerStat, PlayerStatRollup
+
+STAT_NAMES = ("scored", "kills", "assists", "result")
+# Every counter of the rollups, the won_* ones being restricted to the won games
+COUNTER_NAMES = (
+    "num_games", "num_won", "num_mvp", *(f"sum_{n}" for n in STAT_NAMES),
+    "won_num_mvp", *(f"won_sum_{n}" for n in STAT_NAMES),
+)
+
+
+@dataclass
+class Totals:
+    """
+    Counts and sums of a set of player stats, from which winrates and averages are derived. The counters of the won
+    games are kept alongside, so that the statistics can be split between won and lost games.
+    """
+
+    num_games: int = 0
+    num_won: int = 0
+    num_mvp: int = 0
+    sum_scored: int = 0
+    sum_kills: int = 0
+    sum_assists: int = 0
+    sum_result: int = 0
+    won_num_mvp: int = 0
+    won_sum_scored: int = 0
+    won_sum_kills: int = 0
+    won_sum_assists: int = 0
+    won_sum_result: int = 0
+
+    def add(self, row, factor=1):
+        """
+        Add the counts and sums of a rollup row (or of any dict or object with the same keys).
+
+        :param row: A dict or a Totals object.
+        :param factor: Use -1 to subtract the row instead.
+        """
+
+        get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+        for name in COUNTER_NAMES:
+            setattr(self, name, getattr(self, name) + factor * (get(name) or 0))
+
+    @property
+    def won(self):
+        """
+        Totals of the won games only.
+        """
+
+        return Totals(num_games=self.num_won, num_won=self.num_won, num_mvp=self.won_num_mvp,
+                      **{f"sum_{n}": getattr(self, f"won_sum_{n}") for n in STAT_NAMES})
+
+    @property
+    def lost(self):
+        """
+        Totals of the lost games only.
+        """
+
+        return Totals(num_games=self.num_games - self.num_won, num_mvp=self.num_mvp - self.won_num_mvp,
+                      **{f"sum_{n}": getattr(self, f"sum_{n}") - getattr(self, f"won_sum_{n}") for n in STAT_NAMES})
+
+    def _average(self, name):
+        return getattr(self, f"sum_{name}") / self.num_games if self.num_games else None
+
+    @property
+    def winrate(self):
+        """
+        Percentage of won games, or None if no game was played.
+        """
+
+        return 100 * self.num_won / self.num_games if self.num_games else None
+
+    @property
+    def avg_scored(self):
+        return self._average("scored")
+
+    @property
+    def avg_kills(self):
+        return self._average("kills")
+
+    @property
+    def avg_assists(self):
+        return self._average("assists")
+
+    @property
+    def avg_result(self):
+        return self._average("result")
+
+
+@dataclass
+class OpponentStatistics(Totals):
+    """
+    Statistics of the games against a given opponent Pokémon.
+    """
+
+    pokemon: str = ""
+    name: str = ""
+
+
+@dataclass
+class AllyStatistics(Totals):
+    """
+    Statistics of a given teammate.
+    """
+
+    pseudo: str = ""
+
+
+@dataclass
+class MovingAverage(Totals):
+    """
+    Statistics of the games of a given day (inside a season) or season (across seasons), or of a sliding window ending
+    at a given game.
+    """
+
+    key: date | datetime | int | None = None
+
+
+@dataclass
+class TeamStatistics:
+    """
+    Every statistic displayed on the team page.
+    """
+
+    games: Totals
+    per_opponent: list[OpponentStatistics] = field(default_factory=list)
+    per_ally: list[AllyStatistics] = field(default_factory=list)
+
+    @property
+    def num_games(self):
+        return self.games.num_games
+
+    @property
+    def winrate(self):
+        return self.games.winrate
+
+
+@dataclass
+class PlayerStatistics:
+    """
+    Every statistic displayed on the player page.
+    """
+
+    pseudo: str
+    totals: Totals
+
+    @property
+    def num_games(self):
+        return self.totals.num_games
+
+    @property
+    def winrate(self):
+        return self.totals.winrate
+
+
+def _sums():
+    """
+    Aggregation expressions summing every counter of the PlayerStatRollup rows.
+    """
+
+    return {name: Sum(name) for name in COUNTER_NAMES}
+
+
+def _rollup_key(season):
+    """
+    Field used to group the moving averages: per day inside a season, per season otherwise.
+    """
+
+    return "day" if season else "season"
+
+
+def _player_rollups(season, exclude_bots):
+    """
+    PlayerStatRollup rows matching the season and bots filters.
+    """
+
+    player_stats = PlayerStatRollup.objects.all()
+    if season:
+        player_stats = player_stats.filter(season=season)
+    if exclude_bots:
+        player_stats = player_stats.filter(with_bots=False)
+    return player_stats
+
+
+def team_statistics(season=None, exclude_bots=False):
+    """
+    Compute every statistic of the team but the moving averages, with three queries: the games, the allies and the
+    opponents.
+
+    :param season: Season number, or None for every season.
+    :param exclude_bots: Whether to ignore the games played against bots.
+    :return: A TeamStatistics object.
+    """
+
+    games = GameRollup.objects.all()
+    if season:
+        games = games.filter(season=season)
+    if exclude_bots:
+        games = games.filter(with_bots=False)
+    player_stats = _player_rollups(season, exclude_bots)
+
+    result = TeamStatistics(games=Totals())
+    result.games.add(games.aggregate(num_games=Sum("num_games"), num_won=Sum("num_won")))
+
+    per_ally = []
+    ally_rows = player_stats.filter(is_opponent=False).values("pseudo").annotate(**_sums()).order_by()
+    for row in ally_rows:
+        per_ally.append(AllyStatistics(pseudo=row["pseudo"]))
+        per_ally[-1].add(row)
+
+    per_opponent = []
+    opponent_rows = player_stats.filter(is_opponent=True).values("pokemon", "pokemon__name").annotate(**_sums())
+    for row in opponent_rows:
+        per_opponent.append(OpponentStatistics(pokemon=row["pokemon"], name=row["pokemon__name"]))
+        per_opponent[-1].add(row)
+
+    result.per_opponent = sorted(per_opponent, key=lambda s: -s.winrate)
+    result.per_ally = sorted(per_ally, key=lambda s: (-s.avg_result, -s.avg_scored))
+
+    return result
+
+
+def player_statistics(pseudo, season=None, exclude_bots=False):
+    """
+    Compute every statistic of a teammate but the moving averages, with a single query.
+
+    :param pseudo: Pseudo of the teammate.
+    :param season: Season number, or None for every season.
+    :param exclude_bots: Whether to ignore the games played against bots.
+    :return: A PlayerStatistics object.
+    """
+
+    player_stats = _player_rollups(season, exclude_bots).filter(is_opponent=False, pseudo=pseudo)
+
+    result = PlayerStatistics(pseudo=pseudo, totals=Totals())
+    result.totals.add(player_stats.aggregate(**_sums()))
+
+    return result
+
+
+def moving_averages(pseudo=None, season=None, exclude_bots=False):
+    """
+    Compute the averages of the teammates (or of one of them) per day inside a season, or per season across seasons,
+    with a single query. Only the chart endpoints need them, so they are kept apart from the other statistics.
+
+    :param pseudo: Pseudo of a teammate, or None for the whole team.
+    :param season: Season number, or None for every season.
+    :param exclude_bots: Whether to ignore the games played against bots.
+    :return: A list of MovingAverage objects, sorted by key.
+    """
+
+    player_stats = _player_rollups(season, exclude_bots).filter(is_opponent=False)
+    if pseudo:
+        player_stats = player_stats.filter(pseudo=pseudo)
+
+    rows = player_stats.annotate(avg_key=F(_rollup_key(season))).values("avg_key").annotate(
+        **_sums()
+    ).order_by("avg_key")
+
+    result = []
+    for row in rows:
+        result.append(MovingAverage(key=row["avg_key"]))
+        result[-1].add(row)
+
+    return result
+
+
+def sliding_averages(window, size, pseudo=None, season=None, exclude_bots=False):
+    """
+    Compute true rolling averages of the teammates (or of one of them) over their last games or days. The games are
+    retrieved with a single query, then every window is computed in one pass with cumulative sums.
+
+    :param window: "games" to average over the last N games, "days" to average over the last N days.
+    :param size: Size N of the window.
+    :param pseudo: Pseudo of a teammate, or None for the whole team.
+    :param season: Season number, or None for every season.
+    :param exclude_bots: Whether to ignore the games played against bots.
+    :return: A list of MovingAverage objects, one per game, whose key is the date of the game.
+    """
+
+    player_stats = PlayerStat.objects.filter(is_opponent=False)
+    if pseudo:
+        player_stats = player_stats.filter(pseudo=pseudo)
+    if season:
+        player_stats = player_stats.filter(game__season=season)
+    if exclude_bots:
+        player_stats = player_stats.filter(~Exists(PlayerStat.objects.filter(game_id=OuterRef("game_id"), is_bot=True)))
+
+    # One row per game, with the same counters as the rollups
+    rows = list(player_stats.values("game_id", date=F("game__date")).annotate(
+        num_games=Count("id"),
+        num_won=Count("id", filter=Q(game__is_won=True)),
+        num_mvp=Count("id", filter=Q(is_mvp=True)),
+        won_num_mvp=Count("id", filter=Q(is_mvp=True, game__is_won=True)),
+        **{f"sum_{name}": Sum(name) for name in STAT_NAMES},
+        **{f"won_sum_{name}": Sum(name, filter=Q(game__is_won=True), default=0) for name in STAT_NAMES}
+    ).order_by("date", "game_id"))
+
+    cumulative = [Totals()]
+    for row in rows:
+        totals = Totals()
+        totals.add(cumulative[-1])
+        totals.add(row)
+        cumulative.append(totals)
+
+    result = []
+    start = 0
+    for i, row in enumerate(rows):
+        if window == "days":
+            while rows[start]["date"] <= row["date"] - timedelta(days=size):
+                start += 1
+        else:
+            start = max(0, i + 1 - size)
+
+        point = MovingAverage(key=row["date"])
+        point.add(cumulative[i + 1])
+        point.add(cumulative[start], factor=-1)
+        result.append(point)
+
+    return result
+
+
+def cached_team_statistics(season=None, exclude_bots=False):
+    """
+    Same as team_statistics, but the result is cached until the data changes.
+    """
+
+    return stats_cache.get_or_compute("team_statistics", lambda: team_statistics(season, exclude_bots),
+                                      season, exclude_bots)
+
+
+def cached_player_statistics(pseudo, season=None, exclude_bots=False):
+    """
+    Same as player_statistics, but the result is cached until the data changes.
+    """
+
+    return stats_cache.get_or_compute("player_statistics", lambda: player_statistics(pseudo, season, exclude_bots),
+                                      pseudo, season, exclude_bots)
+
+
+def cached_moving_averages(pseudo=None, season=None, exclude_bots=False):
+    """
+    Same as moving_averages, but the result is cached until the data changes.
+    """
+
+    return stats_cache.get_or_compute("moving_averages", lambda: moving_averages(pseudo, season, exclude_bots),
+                                      pseudo, season, exclude_bots)
+
+
+def cached_sliding_averages(window, size, pseudo=None, season=None, exclude_bots=False):
+    """
+    Same as sliding_averages, but the result is cached until the data changes.
+    """
+
+    return stats_cache.get_or_compute("sliding_averages",
+                                      lambda: sliding_averages(window, size, pseudo, season, exclude_bots),
+                                      window, size, pseudo, season, exclude_bots)
@@ -0,0 +1,210 @@
+"""
+Maintenance of the rollup tables (GameRollup and PlayerStatRollup), that hold pre-aggregated statistics per season and
+day so that the statistics pages don't have to scan every player stat ever recorded.
+
+Rollups are refreshed per (season, day) bucket: every row of a bucket is recomputed from the games of that day, which
+is cheap and can never drift from the source tables.
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .cache import bump_data_version
+from .models import Game, GameRollup, PlayerStat, PlayerStatRollup
+
+_deferred = threading.local()
+
+
+def game_bucket(game):
+    """
+    Get the rollup bucket of a game.
+
+    :param game: A Game object.
+    :return: A (season number, day) tuple.
+    """
+
+    date = timezone.localtime(game.date) if timezone.is_aware(game.date) else game.date
+    return game.season_id, date.date()
+
+
+def _bucket_filter(buckets):
+    """
+    Build a filter matching the games of some buckets, using date ranges so that the (season, date) index can be used.
+
+    :param buckets: An iterable of (season number, day) tuples.
+    :return: A Q object.
+    """
+
+    q = Q(pk__in=[])
+    for season, day in buckets:
+        start = datetime.combine(day, time.min)
+        if settings.USE_TZ:
+            start = timezone.make_aware(start)
+        q |= Q(season_id=season, date__gte=start, date__lt=start + timedelta(days=1))
+    return q
+
+
+def _aggregate(games_filter=None):
+    """
+    Compute the rollup rows of the games matching a filter, or of every game.
+
+    :param games_filter: A Q object filtering the Game table, or None.
+    :return: A (list of GameRollup, list of PlayerStatRollup) tuple, not saved yet.
+    """
+
+    games = Game.objects.all()
+    player_stats = PlayerStat.objects.all()
+    if games_filter is not None:
+        games = games.filter(games_filter)
+        player_stats = player_stats.filter(game__in=games.values("pk"))
+
+    game_rows = games.annotate(
+        day=TruncDate("date"),
+        with_bots=Exists(PlayerStat.objects.filter(game_id=OuterRef("pk"), is_bot=True)),
+    ).values("season_id", "day", "with_bots").annotate(
+        num_games=Count("id"),
+        num_won=Count("id", filter=Q(is_won=True)),
+    ).order_by()
+
+    player_rows = player_stats.annotate(
+        season_id=F("game__season_id"),
+        day=TruncDate("game__date"),
+        with_bots=Exists(PlayerStat.objects.filter(game_id=OuterRef("game_id"), is_bot=True)),
+        rollup_pseudo=Case(When(is_opponent=True, then=Value("")), default=F("pseudo")),
+    ).values("season_id", "day", "with_bots", "rollup_pseudo", "is_opponent", "pokemon_id").annotate(
+        num_games=Count("id"),
+        num_won=Count("id", filter=Q(game__is_won=True)),
+        num_mvp=Count("id", filter=Q(is_mvp=True)),
+        sum_scored=Sum("scored"),
+        sum_kills=Sum("kills"),
+        sum_assists=Sum("assists"),
+        sum_result=Sum("result"),
+        # Conditional aggregation, so that the won/lost split comes from the same pass
+        won_num_mvp=Count("id", filter=Q(is_mvp=True, game__is_won=True)),
+        won_sum_scored=Sum("scored", filter=Q(game__is_won=True), default=0),
+        won_sum_kills=Sum("kills", filter=Q(game__is_won=True), default=0),
+        won_sum_assists=Sum("assists", filter=Q(game__is_won=True), default=0),
+        won_sum_result=Sum("result", filter=Q(game__is_won=True), default=0),
+    ).order_by()
+
+    return (
+        [GameRollup(**row) for row in game_rows],
+        [PlayerStatRollup(pseudo=row.pop("rollup_pseudo"), **row) for row in player_rows],
+    )
+
+
+@transaction.atomic
+def refresh_buckets(buckets):
+    """
+    Recompute the rollup rows of some buckets.
+
+    :param buckets: An iterable of (season number, day) tuples.
+    """
+
+    buckets = set(buckets)
+    if not buckets:
+        return
+
+    for model in (GameRollup, PlayerStatRollup):
+        q = Q(pk__in=[])
+        for season, day in buckets:
+            q |= Q(season_id=season, day=day)
+        model.objects.filter(q).delete()
+
+    game_rows, player_rows = _aggregate(_bucket_filter(buckets))
+    GameRollup.objects.bulk_create(game_rows)
+    PlayerStatRollup.objects.bulk_create(player_rows, batch_size=500)
+
+    # The cached aggregates read the rollups, which may have been refreshed after the write that bumped the version
+    bump_data_version()
+
+
+def refresh_games(game_ids):
+    """
+    Recompute the rollup rows of the buckets of some games.
+
+    :param game_ids: Primary keys of the games.
+    """
+
+    mark_dirty(game_bucket(game) for game in Game.objects.filter(pk__in=game_ids).only("season", "date"))
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Rebuild every rollup row from scratch.
+
+    :return: A (number of game rollups, number of player stat rollups) tuple.
+    """
+
+    GameRollup.objects.all().delete()
+    PlayerStatRollup.objects.all().delete()
+
+    game_rows, player_rows = _aggregate()
+    GameRollup.objects.bulk_create(game_rows, batch_size=500)
+    PlayerStatRollup.objects.bulk_create(player_rows, batch_size=500)
+    bump_data_version()
+
+    return len(game_rows), len(player_rows)
+
+
+def mark_dirty(buckets):
+    """
+    Refresh some buckets, either right away or when leaving the current deferred() block.
+
+    :param buckets: An iterable of (season number, day) tuples.
+    """
+
+    pending = getattr(_deferred, "buckets", None)
+    if pending is None:
+        refresh_buckets(buckets)
+    else:
+        pending.update(buckets)
+
+
+def mark_games_dirty(game_ids):
+    """
+    Refresh the buckets of some games, either right away or when leaving the current deferred() block. Inside a block,
+    the buckets of every game are looked up together when leaving it.
+
+    :param game_ids: Primary keys of the games.
+    """
+
+    pending = getattr(_deferred, "game_ids", None)
+    if pending is None:
+        refresh_games(game_ids)
+    else:
+        pending.update(game_ids)
+
+
+@contextmanager
+def deferred():
+    """
+    Context manager that delays the refresh of the rollups until the end of the block, so that a bucket touched by many
+    writes (e.g. during an import, or when games are deleted from the admin) is only recomputed once.
+    """
+
+    if getattr(_deferred, "buckets", None) is not None:  # Already deferred by an outer block
+        yield
+        return
+
+    _deferred.buckets = set()
+    _deferred.game_ids = set()
+    try:
+        yield
+        buckets, game_ids = _deferred.buckets, sorted(_deferred.game_ids)
+    finally:
+        _deferred.buckets = _deferred.game_ids = None
+    # Deleted games are not found, but their buckets were marked by their own delete signal
+    for i in range(0, len(game_ids), 500):
+        games = Game.objects.filter(pk__in=game_ids[i:i + 500]).only("season", "date")
+        buckets.update(game_bucket(game) for game in games)
+    refresh_buckets(buckets)
+
@@ -0,0 +1,108 @@
+"""
+Signal receivers that keep the cached data consistent with the database.
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import aliases, rollups
+from .cache import bump_data_version, bump_game_version, bump_pokemon_version, games_count_key
+from .models import Game, PlayerStat, Pokemon, PokemonAlias, Teammate, TeammateAlias
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_game(sender, instance, **kwargs):
+    """
+    Invalidate the rendered card of a game, as well as the cached number of games.
+    """
+
+    bump_game_version(instance.pk)
+    bump_data_version()
+    cache.delete_many([games_count_key(), games_count_key(instance.season_id)])
+
+
+@receiver(post_save, sender=PlayerStat)
+@receiver(post_delete, sender=PlayerStat)
+def invalidate_player_stat(sender, instance, **kwargs):
+    """
+    Invalidate the rendered card of the game of a player.
+    """
+
+    bump_game_version(instance.game_id)
+    bump_data_version()
+
+
+@receiver(post_save, sender=Teammate)
+@receiver(post_delete, sender=Teammate)
+def invalidate_teammate(sender, instance, **kwargs):
+    """
+    Invalidate the data depending on the list of teammates.
+    """
+
+    bump_data_version()
+
+
+@receiver(post_save, sender=Pokemon)
+@receiver(post_delete, sender=Pokemon)
+def invalidate_pokemon(sender, instance, **kwargs):
+    """
+    Invalidate the rendered game cards and the statistics, that show the names and categories of the Pokémon.
+    """
+
+    bump_pokemon_version()
+    bump_data_version()
+
+
+@receiver(post_save, sender=Pokemon)
+@receiver(post_delete, sender=Pokemon)
+@receiver(post_save, sender=PokemonAlias)
+@receiver(post_delete, sender=PokemonAlias)
+@receiver(post_save, sender=Teammate)
+@receiver(post_delete, sender=Teammate)
+@receiver(post_save, sender=TeammateAlias)
+@receiver(post_delete, sender=TeammateAlias)
+def invalidate_aliases(sender, instance, **kwargs):
+    """
+    Reload the names of the Pokémon and of the teammates.
+    """
+
+    aliases.invalidate()
+
+
+@receiver(pre_save, sender=Game)
+def remember_game_bucket(sender, instance, **kwargs):
+    """
+    Remember the rollup bucket of a game before it's modified, as its date or season may change.
+    """
+
+    instance._previous_bucket = None
+    if instance.pk:
+        previous = Game.objects.filter(pk=instance.pk).only("season", "date").first()
+        if previous:
+            instance._previous_bucket = rollups.game_bucket(previous)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def refresh_game_rollups(sender, instance, **kwargs):
+    """
+    Refresh the rollups of the day of a game, and of its previous day if it was moved.
+    """
+
+    buckets = {rollups.game_bucket(instance)}
+    if getattr(instance, "_previous_bucket", None):
+        buckets.add(instance._previous_bucket)
+    rollups.mark_dirty(buckets)
+
+
+@receiver(post_save, sender=PlayerStat)
+@receiver(post_delete, sender=PlayerStat)
+def refresh_player_stat_rollups(sender, instance, **kwargs):
+    """
+    Refresh the rollups of the day of the game of a player.
+    """
+
+    # A game deleted with its players is not found anymore, but its own receiver refreshes the rollups
+    rollups.mark_games_dirty([instance.game_id])
@@ -1,3 +1,1299 @@
-from django.test import TestCase
+import csv
+import json
+import tracemalloc
+import re
+import tempfile
+import threading
+import time
+from functools import partial
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from datetime import datetime, timedelta, timezone
 
-# Create your tests here.
+from PIL import Image, ImageDraw, ImageFont
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from pyocr.builders import Box, WordBoxBuilder
+
+from .models import Game, GameRollup, ImportJob, PlayerStat, PlayerStatRollup, Pokemon, PokemonAlias, Season, \
+    Teammate, TeammateAlias
+from . import cache as stats_cache
+from . import aliases, jobs, ocr, queries, rollups, utils
+from .management.commands import benchmark_views
+from .pagination import keyset_paginate
+
+ALLIES = ["Jejy", "AliceCheshir", "Leutik", "Helizen", "Renn_Kane"]
+POKEMONS = ["ZERAORA", "LUCARIO", "PIKACHU", "CRAMORANT", "SNORLAX"]
+
+
+def create_games(num_games, season=None, start=None):
+    """
+    Create a number of complete games (five allies and five opponents each), one hour apart.
+
+    :param num_games: Number of games to create.
+    :param season: Season of the games, the first season is created if not provided.
+    :param start: Date of the first game.
+    :return: The list of created games.
+    """
+
+    season = season or Season.objects.get_or_create(number=1)[0]
+    start = start or datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    for pseudo in ALLIES:
+        Teammate.objects.get_or_create(pseudo=pseudo)
+
+    games = []
+    with rollups.deferred():
+        for i in range(num_games):
+            game = Game.objects.create(date=start + timedelta(hours=i), season=season, is_won=i % 2 == 0,
+                                       score_allies=100 + i, score_opponents=90)
+            for j in range(10):
+                PlayerStat.objects.create(
+                    game=game,
+                    pseudo=ALLIES[j] if j < 5 else f"Opponent_{j}",
+                    pokemon=Pokemon.objects.get(id=POKEMONS[j % 5]),
+                    is_opponent=j >= 5,
+                    scored=10 * j,
+                    kills=j,
+                    assists=j,
+                    result=j % 5 + 1
+                )
+            games.append(game)
+        utils.update_mvp(games)
+
+    return games
+
+
+def scrape_csv(num_games, allies=ALLIES, num_bots=0):
+    """
+    Build a uniteapi.dev Web Scraper dump, as expected by utils.bulk_import.
+
+    :param num_games: Number of games, all won and played one hour apart from the 1st of January 2024.
+    :param allies: Pseudos of the allies.
+    :param num_bots: Number of bots in the opponent team of each game.
+    :return: An uploaded csv file.
+    """
+
+    def player(pseudo, pokemon, j):
+        return ["", "", "", pseudo, 10 * j, f"{j}|{j}|0", "", "", "",
+                f"https://uniteapi.dev/Sprites/t_Square_{pokemon.capitalize()}.png"]
+
+    out = StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["web-scraper-order", "web-scraper-start-url", "result", "pseudo", "scored", "kda"])
+    for i in range(num_games):
+        writer.writerow(["", "", "Victory - 500"])
+        writer.writerow(["", "", "Defeat - 400"])
+        writer.writerows(player(pseudo, pokemon, j) for j, (pseudo, pokemon) in enumerate(zip(allies, POKEMONS)))
+        writer.writerow([])
+        writer.writerows(player("BOT" if j >= 5 - num_bots else f"Opponent_{j}", pokemon, j)
+                         for j, pokemon in enumerate(POKEMONS))
+    for i in range(num_games):
+        date = datetime(2024, 1, 1, 12) + timedelta(hours=i)
+        writer.writerow(["", "", "", "", "", "", "Win", "", date.strftime("%d-%m-%Y %H:%M")])
+
+    return SimpleUploadedFile("dump.csv", out.getvalue().encode())
+
+
+class FakeOcrTool:
+    """
+    Stand-in for a pyocr tool, recognizing given texts in the boxes of the result screen.
+    """
+
+    def __init__(self, texts):
+        """
+        :param texts: Texts of the screenshot indexed by box name, each word being placed at its own position.
+        """
+
+        self.texts = texts
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_name(self):
+        return "Fake"
+
+    def image_to_string(self, image, lang=None, builder=None):
+        with self._lock:  # Called by the threads of the engine
+            self.calls += 1
+        if not isinstance(builder, WordBoxBuilder):  # A box missed by the single pass
+            return " ? "
+
+        boxes = utils._prefill_boxes()
+        left, top = utils.RESULT_PANEL[:2]
+        word_boxes = []
+        for name, text in self.texts.items():
+            bb = boxes[name]
+            for i, word in enumerate(text.split()):
+                x = bb[0] + 2 + 20 * i - left
+                word_boxes.append(Box(word, ((x, bb[1] + 5 - top), (x + 15, bb[3] - 5 - top))))
+        return word_boxes[::-1]  # Not in reading order
+
+
+class GameContextTestCase(TestCase):
+    """
+    Tests for the construction of the game cards context.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_teams_and_mvp(self):
+        game = create_games(1)[0]
+        context = utils.construct_game_context(game)
+
+        self.assertEqual(context["pk"], game.pk)
+        self.assertEqual([t["score"] for t in context["teams"]], [game.score_allies, game.score_opponents])
+        for team in context["teams"]:
+            self.assertEqual(len(team["players"]), 5)
+            mvps = [p for p in team["players"] if p["is_mvp"]]
+            self.assertEqual(len(mvps), 1)
+            self.assertEqual(mvps[0]["result"], max(p["result"] for p in team["players"]))
+            self.assertIsInstance(mvps[0]["pokemon"], Pokemon)
+
+    def test_bulk_context_query_count(self):
+        create_games(30)
+
+        for num_games in (1, 10, 30):
+            games = list(Game.objects.order_by("-date")[:num_games])
+            with self.assertNumQueries(1):
+                contexts = utils.construct_games_context(games)
+                for context in contexts:  # Accessing the Pokémon must not trigger any query
+                    [str(p["pokemon"]) for team in context["teams"] for p in team["players"]]
+            self.assertEqual([c["pk"] for c in contexts], [g.pk for g in games])
+
+    def test_games_list_query_count(self):
+        create_games(30)
+
+        for per_page in (1, 10, 30):
+            cache.clear()
+            with self.assertNumQueries(3):  # Games, player stats and seasons
+                response = self.client.get(reverse("games_list"), {"per_page": per_page})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context["games"]), per_page)
+
+    def test_game_detail(self):
+        game = create_games(1)[0]
+
+        response = self.client.get(reverse("game_detail", kwargs={"game_id": game.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page_title"], str(game))
+        self.assertContains(response, "game-detail-mvp", count=2)
+
+
+class KeysetPaginationTestCase(TestCase):
+    """
+    Tests for the keyset pagination of the games list.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_walk_pages(self):
+        games = create_games(7)
+        games.sort(key=lambda g: (g.date, g.pk), reverse=True)
+
+        first = keyset_paginate(Game.objects.all(), 3)
+        self.assertEqual(list(first), games[:3])
+        self.assertFalse(first.has_previous)
+        second = keyset_paginate(Game.objects.all(), 3, after=first.next_cursor)
+        self.assertEqual(list(second), games[3:6])
+        last = keyset_paginate(Game.objects.all(), 3, after=second.next_cursor)
+        self.assertEqual(list(last), games[6:])
+        self.assertFalse(last.has_next)
+
+        back = keyset_paginate(Game.objects.all(), 3, before=last.previous_cursor)
+        self.assertEqual(list(back), games[3:6])
+        self.assertTrue(back.has_previous)
+        back = keyset_paginate(Game.objects.all(), 3, before=back.previous_cursor)
+        self.assertEqual(list(back), games[:3])
+        self.assertFalse(back.has_previous)
+
+    def test_season_filter_is_kept(self):
+        create_games(3, season=Season.objects.create(number=1))
+        create_games(3, season=Season.objects.create(number=2), start=datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+        response = self.client.get(reverse("games_list"), {"season": 1, "per_page": 2})
+        self.assertEqual({g.season_id for g in response.context["games"]}, {1})
+        next_cursor = response.context["page_obj"].next_cursor
+        self.assertContains(response, "season=1&amp;per_page=2&amp;after=")
+
+        response = self.client.get(reverse("games_list"), {"season": 1, "per_page": 2, "after": next_cursor})
+        self.assertEqual([g.season_id for g in response.context["games"]], [1])
+
+    def test_page_number_count_is_cached(self):
+        create_games(5)
+
+        response = self.client.get(reverse("games_list"), {"page": 2, "per_page": 2})
+        self.assertEqual(response.context["page_obj"].paginator.num_pages, 3)
+        with self.assertNumQueries(3):  # No COUNT(*) once the total is cached
+            response = self.client.get(reverse("games_list"), {"page": 3, "per_page": 2})
+        self.assertEqual(len(response.context["games"]), 1)
+
+
+class GameCardCacheTestCase(TestCase):
+    """
+    Tests for the cache of the rendered game cards.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCardsCached(self):
+        create_games(5)
+
+        self.client.get(reverse("games_list"))
+        with self.assertNumQueries(2):  # Games and seasons, every card is cached
+            response = self.client.get(reverse("games_list"))
+        self.assertContains(response, "game-detail-mvp", count=10)
+
+        # Changing a player only renders its game again
+        stat = PlayerStat.objects.filter(is_opponent=False).order_by("game__date").last()
+        stat.pseudo = "Jejy_renamed"
+        stat.save()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("games_list"))
+        self.assertContains(response, "Jejy_renamed", count=1)
+
+        # Renaming a Pokémon renders every card again
+        pokemon = Pokemon.objects.get(id=POKEMONS[0])
+        pokemon.name = "Zeraora renommé"
+        pokemon.save()
+        response = self.client.get(reverse("games_list"))
+        self.assertContains(response, "Zeraora renommé", count=10)
+
+    def test_locmem_cache(self):
+        self.assertCardsCached()
+
+    def test_filesystem_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with override_settings(CACHES={"default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": cache_dir,
+            }}):
+                self.assertCardsCached()
+
+    def test_deleted_game_is_not_counted(self):
+        games = create_games(3)
+
+        response = self.client.get(reverse("games_list"), {"page": 1})
+        self.assertEqual(response.context["page_obj"].paginator.count, 3)
+        games[0].delete()
+        response = self.client.get(reverse("games_list"), {"page": 1})
+        self.assertEqual(response.context["page_obj"].paginator.count, 2)
+
+
+class MvpTestCase(TestCase):
+    """
+    Tests for the MVP flag stored on each player.
+    """
+
+    def test_update_mvp(self):
+        games = create_games(3)
+
+        self.assertEqual(PlayerStat.objects.filter(is_mvp=True).count(), 6)
+        for game in games:
+            mvps = utils.find_mvps(game.playerstat_set.order_by("pseudo"))
+            self.assertEqual({p.pk for p in mvps},
+                             set(game.playerstat_set.filter(is_mvp=True).values_list("pk", flat=True)))
+
+        # A draw on the mark is resolved with the scored points
+        stat = games[0].playerstat_set.get(pseudo="Jejy")
+        stat.result = 5
+        stat.save()
+        self.assertEqual(utils.update_mvp(games), 0)
+        stat.scored = 1000
+        stat.save()
+        self.assertEqual(utils.update_mvp(games), 2)
+        self.assertTrue(games[0].playerstat_set.get(pseudo="Jejy").is_mvp)
+        self.assertEqual(games[0].playerstat_set.filter(is_mvp=True, is_opponent=False).count(), 1)
+
+    def test_backfill_command(self):
+        create_games(4)
+        PlayerStat.objects.update(is_mvp=False)
+
+        call_command("backfill_mvp", batch_size=3, stdout=StringIO())
+        self.assertEqual(PlayerStat.objects.filter(is_mvp=True).count(), 8)
+
+    def test_mvp_count_per_teammate(self):
+        create_games(2)
+
+        response = self.client.get(reverse("team_stats"))
+        num_mvp = {p.pseudo: p.num_mvp for p in response.context["per_ally_averages"]}
+        self.assertEqual(num_mvp["Renn_Kane"], 2)
+        self.assertEqual(sum(num_mvp.values()), 2)
+
+
+class RollupTestCase(TestCase):
+    """
+    Tests for the rollup tables used by the statistics pages.
+    """
+
+    def assertRollupsConsistent(self):
+        """
+        Check that the incrementally maintained rollups are the same as rollups rebuilt from scratch.
+        """
+
+        def snapshot():
+            return (
+                sorted(GameRollup.objects.values_list("season", "day", "num_games", "num_won")),
+                sorted(PlayerStatRollup.objects.values_list(
+                    "season", "day", "pseudo", "is_opponent", "pokemon", "num_games", "num_won", "num_mvp",
+                    "sum_scored", "sum_kills", "sum_assists", "sum_result"
+                ))
+            )
+
+        incremental = snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, snapshot())
+
+    def test_incremental_updates(self):
+        games = create_games(30)
+        self.assertEqual(GameRollup.objects.get(day="2024-01-01").num_games, 12)
+        self.assertRollupsConsistent()
+
+        stat = games[0].playerstat_set.get(pseudo="Jejy")
+        stat.scored = 500
+        stat.save()
+        self.assertRollupsConsistent()
+
+        games[1].date += timedelta(days=3)
+        games[1].save()
+        self.assertRollupsConsistent()
+
+        games[2].delete()
+        self.assertRollupsConsistent()
+        self.assertEqual(GameRollup.objects.aggregate(n=Sum("num_games"))["n"], 29)
+
+    def test_admin_delete(self):
+        games = create_games(40)
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+        def num_rollup_writes(ctx):
+            return sum(q["sql"].startswith(("DELETE", "INSERT")) and "rollup" in q["sql"] for q in ctx.captured_queries)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("admin:stats_game_changelist"), {
+                "action": "delete_selected", "post": "yes", "_selected_action": [game.pk for game in games[:30]],
+            })
+        # The two days are recomputed together once, instead of once per deleted game and player
+        self.assertEqual(num_rollup_writes(ctx), 4)
+        self.assertRedirects(response, reverse("admin:stats_game_changelist"))
+        self.assertEqual(GameRollup.objects.aggregate(n=Sum("num_games"))["n"], 10)
+        self.assertRollupsConsistent()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("admin:stats_game_delete", args=[games[30].pk]), {"post": "yes"})
+        self.assertEqual(num_rollup_writes(ctx), 4)
+        self.assertRedirects(response, reverse("admin:stats_game_changelist"))
+        self.assertRollupsConsistent()
+
+    def test_team_stats(self):
+        create_games(4)
+
+        response = self.client.get(reverse("team_stats"))
+        self.assertEqual(response.context["num_games"], 4)
+        self.assertEqual(response.context["win_percentage"], 50)
+        averages = {p.pseudo: p for p in response.context["per_ally_averages"]}
+        self.assertEqual(averages["Helizen"].avg_scored, 30)
+        self.assertEqual(averages["Helizen"].avg_result, 4)
+        self.assertEqual(
+            {s.pokemon: s.winrate for s in response.context["per_opponent_winrate"]},
+            {pokemon: 50 for pokemon in POKEMONS}
+        )
+
+    def test_player_detail(self):
+        create_games(4)
+
+        response = self.client.get(reverse("player_detail", kwargs={"pseudo": "Leutik"}), {"season": 1})
+        self.assertEqual(response.context["num_games"], 4)
+        self.assertEqual(response.context["averages"].avg_kills, 2)
+
+        response = self.client.get(reverse("player_chart", kwargs={"pseudo": "Leutik"}), {"season": 1})
+        self.assertEqual(response.json()["labels"], ["2024-01-01"])
+
+    def test_rebuild_command(self):
+        create_games(3)
+        PlayerStatRollup.objects.all().delete()
+
+        call_command("rebuild_rollups", stdout=StringIO())
+        self.assertEqual(PlayerStatRollup.objects.aggregate(n=Sum("num_games"))["n"], 30)
+
+
+class StatisticsEngineTestCase(TestCase):
+    """
+    Tests for the statistics engine used by the team and player pages.
+    """
+
+    def test_team_statistics_query_count(self):
+        create_games(10)
+        create_games(5, season=Season.objects.create(number=2), start=datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+        with self.assertNumQueries(3):
+            statistics = queries.team_statistics()
+        self.assertEqual(statistics.num_games, 15)
+        self.assertEqual(sum(ally.num_games for ally in statistics.per_ally), 75)
+        with self.assertNumQueries(1):
+            self.assertEqual([point.key for point in queries.moving_averages()], [1, 2])
+
+        with self.assertNumQueries(3):
+            statistics = queries.team_statistics(season=2)
+        self.assertEqual(statistics.num_games, 5)
+        self.assertEqual(statistics.winrate, 60)
+
+    def test_player_statistics_query_count(self):
+        create_games(10)
+
+        with self.assertNumQueries(1):
+            statistics = queries.player_statistics("Jejy", season=1)
+        self.assertEqual(statistics.num_games, 10)
+        self.assertEqual(statistics.winrate, 50)
+        self.assertEqual(statistics.totals.avg_scored, 0)
+        self.assertEqual(len(queries.moving_averages("Jejy", season=1)), 1)
+
+    def test_won_lost_split(self):
+        games = create_games(4)  # The first and third games are won
+        PlayerStat.objects.filter(game__is_won=True, pseudo="Jejy").update(scored=20, is_mvp=True)
+        rollups.refresh_games([game.pk for game in games])
+
+        with self.assertNumQueries(1):
+            totals = queries.player_statistics("Jejy").totals
+        self.assertEqual((totals.won.num_games, totals.lost.num_games), (2, 2))
+        self.assertEqual((totals.won.avg_scored, totals.lost.avg_scored), (20, 0))
+        self.assertEqual((totals.won.num_mvp, totals.lost.num_mvp), (2, 0))
+
+        # Same split with the sliding windows
+        last = queries.sliding_averages("games", 4, pseudo="Jejy")[-1]
+        self.assertEqual((last.won.avg_scored, last.lost.avg_scored), (20, 0))
+        self.assertEqual(queries.team_statistics().per_opponent[0].lost.num_games, 2)
+
+        response = self.client.get(reverse("api_player_stats", kwargs={"pseudo": "Jejy"})).json()
+        self.assertEqual(response["totals"]["won"]["avg_scored"], 20)
+        self.assertEqual(response["moving_averages"][0]["lost"]["num_games"], 2)
+
+
+class SlidingWindowTestCase(TestCase):
+    """
+    Tests for the sliding window moving averages.
+    """
+
+    def test_last_games(self):
+        games = create_games(5)
+        for i, game in enumerate(games):
+            game.playerstat_set.filter(pseudo="Jejy").update(scored=i * 10)
+
+        points = queries.sliding_averages("games", 2, pseudo="Jejy")
+        self.assertEqual([p.key for p in points], [g.date for g in games])
+        self.assertEqual([p.avg_scored for p in points], [0, 5, 15, 25, 35])
+        self.assertEqual([p.winrate for p in points], [100, 50, 50, 50, 50])
+
+    def test_last_days(self):
+        create_games(3, start=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        create_games(2, start=datetime(2024, 1, 5, tzinfo=timezone.utc))
+
+        points = queries.sliding_averages("days", 2)
+        self.assertEqual([p.num_games for p in points], [5, 10, 15, 5, 10])  # Five allies per game
+        self.assertEqual(points[-1].avg_result, 3)
+
+    def test_view(self):
+        create_games(4)
+
+        response = self.client.get(reverse("player_detail", kwargs={"pseudo": "Helizen"}),
+                                   {"window": "games", "window_size": 3})
+        self.assertEqual(response.context["chart_type"], "date")
+        self.assertEqual(response.context["chart_url"],
+                         reverse("player_chart", kwargs={"pseudo": "Helizen"}) + "?window=games&window_size=3")
+
+        series = self.client.get(response.context["chart_url"]).json()
+        self.assertEqual(len(series["labels"]), 4)
+        self.assertEqual(series["datasets"][0]["data"], [30, 30, 30, 30])
+        series = self.client.get(reverse("team_stats_chart"), {"window": "days", "window_size": 1}).json()
+        self.assertEqual(len(series["labels"]), 4)
+
+    def test_chart_cache(self):
+        create_games(4)
+        url = reverse("team_stats_chart")
+
+        response = self.client.get(url, {"window": "games", "window_size": 2})
+        self.assertIn("no-cache", response["Cache-Control"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, {"window": "games", "window_size": 2}).json(), response.json())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        create_games(1, start=datetime(2024, 1, 2, tzinfo=timezone.utc))
+        self.assertEqual(len(self.client.get(url, {"window": "games", "window_size": 2}).json()["labels"]), 5)
+
+
+    def test_page_without_chart_query(self):
+        # The moving averages are only computed by the chart endpoint
+        create_games(4)
+        cache.clear()
+        stats_cache.reset_counters()
+
+        self.client.get(reverse("team_stats"))
+        self.client.get(reverse("player_detail", kwargs={"pseudo": "Jejy"}))
+        self.assertEqual(stats_cache.get_counters()["moving_averages"], {"hits": 0, "misses": 0})
+        self.assertEqual(len(self.client.get(reverse("team_stats_chart")).json()["labels"]), 1)
+        self.assertEqual(stats_cache.get_counters()["moving_averages"], {"hits": 0, "misses": 1})
+
+
+class BotTestCase(TestCase):
+    """
+    Tests for the exclusion of the games played against bots.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def create_bot_game(self):
+        games = create_games(4)
+        bot = games[0].playerstat_set.get(pseudo="Opponent_9")
+        bot.pseudo = "BOT_4"
+        bot.is_bot = True
+        bot.save()
+        return games
+
+    def test_statistics(self):
+        self.create_bot_game()
+
+        self.assertEqual(queries.team_statistics().num_games, 4)
+        statistics = queries.team_statistics(exclude_bots=True)
+        self.assertEqual(statistics.num_games, 3)
+        self.assertEqual(statistics.winrate, 100 / 3)
+        self.assertEqual(sum(s.num_games for s in statistics.per_opponent), 15)
+        self.assertEqual(queries.player_statistics("Jejy", exclude_bots=True).num_games, 3)
+        self.assertEqual(len(queries.sliding_averages("games", 2, pseudo="Jejy", exclude_bots=True)), 3)
+
+    def test_views(self):
+        games = self.create_bot_game()
+
+        response = self.client.get(reverse("games_list"), {"exclude_bots": "on"})
+        self.assertEqual({g.pk for g in response.context["games"]}, {g.pk for g in games[1:]})
+        response = self.client.get(reverse("games_list"), {"exclude_bots": "on", "page": 1})
+        self.assertEqual(response.context["page_obj"].paginator.count, 3)
+
+        response = self.client.get(reverse("team_stats"), {"exclude_bots": "on"})
+        self.assertEqual(response.context["num_games"], 3)
+        self.assertIn("exclude_bots=on", response.context["chart_url"])
+        series = self.client.get(response.context["chart_url"]).json()
+        self.assertEqual(len(series["labels"]), 1)
+
+
+class GenerateFakeGamesTestCase(TestCase):
+    """
+    Tests for the generate_fake_games command.
+    """
+
+    def generate(self):
+        call_command("generate_fake_games", games=30, seasons=2, teammates=6, bot_rate=0.5, seed=42, stdout=StringIO())
+        return list(PlayerStat.objects.order_by("game__date", "pseudo").values_list(
+            "game__date", "game__season", "game__is_won", "pseudo", "pokemon", "scored", "kills", "result", "is_mvp",
+            "is_bot"
+        ))
+
+    def test_deterministic(self):
+        first = self.generate()
+        self.assertEqual(len(first), 300)
+        self.assertEqual(Game.objects.filter(season=2).count(), 15)
+        self.assertTrue(any(row[-1] for row in first))  # Bots
+        self.assertEqual(PlayerStat.objects.filter(is_mvp=True).count(), 60)
+        self.assertEqual(queries.team_statistics().num_games, 30)  # Rollups are rebuilt
+
+        with rollups.deferred():
+            Game.objects.all().delete()
+        self.assertEqual(self.generate(), first)
+
+    def test_run_again(self):
+        # Running the command again only adds the missing games
+        first = self.generate()
+        Game.objects.filter(pk__in=Game.objects.order_by("date")[:5].values("pk")).delete()
+        self.assertEqual(self.generate(), first)
+        self.assertEqual(self.generate(), first)
+
+
+class BenchmarkViewsTestCase(TestCase):
+    """
+    Tests for the benchmark_views command.
+    """
+
+    def test_baseline(self):
+        create_games(3)
+
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            baseline_file = Path(baseline_dir) / "views.json"
+            with self.assertRaisesRegex(CommandError, "No baseline"):
+                call_command("benchmark_views", repeat=1, baseline=baseline_file, stdout=StringIO())
+            call_command("benchmark_views", repeat=2, baseline=baseline_file, save=True, stdout=StringIO())
+            baseline = json.loads(baseline_file.read_text())
+            self.assertEqual(baseline["games"], 3)
+            self.assertEqual(baseline["results"]["game_detail"]["queries"], 2)
+
+            # A page doing more queries than its baseline is a regression
+            baseline["results"]["team_stats"]["queries"] -= 1
+            baseline_file.write_text(json.dumps(baseline))
+            with self.assertRaisesRegex(CommandError, "team_stats: queries"):
+                call_command("benchmark_views", repeat=2, baseline=baseline_file, stdout=StringIO())
+
+            # Timings of another dataset can't be compared
+            create_games(1, start=datetime(2024, 2, 1, tzinfo=timezone.utc))
+            with self.assertRaisesRegex(CommandError, "recorded on 3 games"):
+                call_command("benchmark_views", repeat=1, baseline=baseline_file, stdout=StringIO())
+
+
+    def test_regressions(self):
+        reference = {"p50_ms": 100, "p95_ms": 120, "queries": 3, "peak_kib": 1000}
+        regressions = partial(benchmark_views.Command().regressions, "page", reference=reference, threshold=1,
+                              memory_threshold=0.1, min_delta=5)
+        # Latency noise and a slower p95 are tolerated, not a doubled p50, nor more queries or memory
+        self.assertEqual(regressions(reference | {"p50_ms": 170, "p95_ms": 400}), [])
+        self.assertEqual(regressions(reference | {"p50_ms": 210}), ["page: p50_ms 100 -> 210"])
+        self.assertEqual(regressions(reference | {"queries": 4}), ["page: queries 3 -> 4"])
+        self.assertEqual(regressions(reference | {"peak_kib": 1200}), ["page: peak_kib 1000 -> 1200"])
+
+
+class BenchmarkStatsTestCase(TestCase):
+    """
+    Tests for the benchmark_stats command.
+    """
+
+    def test_baseline(self):
+        create_games(3)
+
+        with tempfile.TemporaryDirectory() as baseline_dir:
+            baseline_file = Path(baseline_dir) / "stats.json"
+            with self.assertRaisesRegex(CommandError, "No recorded result"):
+                call_command("benchmark_stats", repeat=1, baseline=baseline_file, stdout=StringIO())
+            call_command("benchmark_stats", repeat=1, baseline=baseline_file, save=True, stdout=StringIO())
+            baseline = json.loads(baseline_file.read_text())
+            self.assertEqual(baseline["dataset"]["games"], 3)
+
+            baseline["results"]["team"]["queries"] -= 1
+            baseline_file.write_text(json.dumps(baseline))
+            with self.assertRaisesRegex(CommandError, "team: queries"):
+                call_command("benchmark_stats", repeat=1, baseline=baseline_file, stdout=StringIO())
+
+            create_games(1, start=datetime(2024, 2, 1, tzinfo=timezone.utc))
+            with self.assertRaisesRegex(CommandError, "another dataset"):
+                call_command("benchmark_stats", repeat=1, baseline=baseline_file, stdout=StringIO())
+
+
+class BulkImportTestCase(TestCase):
+    """
+    Tests for the import of Web Scraper dumps.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.season = Season.objects.create(number=1)
+        for pseudo in ALLIES:
+            Teammate.objects.create(pseudo=pseudo)
+
+    def test_import(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(utils.bulk_import(scrape_csv(300, num_bots=2), self.season), (300, 0))
+        # Batched inserts: far fewer queries than games (SQLite limits the number of rows per INSERT)
+        self.assertLess(len(ctx.captured_queries), 60)
+
+        self.assertEqual(PlayerStat.objects.count(), 3000)
+        self.assertEqual(PlayerStat.objects.filter(is_bot=True).count(), 600)
+        self.assertEqual(set(PlayerStat.objects.filter(is_bot=True).values_list("pseudo", flat=True)),
+                         {"BOT_3", "BOT_4"})
+        # Every result is 0, so the MVPs are the players who scored the most
+        self.assertEqual(set(PlayerStat.objects.filter(is_mvp=True).values_list("pseudo", flat=True)),
+                         {"Renn_Kane", "BOT_4"})
+        self.assertEqual(queries.team_statistics().num_games, 300)
+
+    def test_chunks(self):
+        # Every chunk is committed on its own, with its rollups and caches up to date
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(utils.bulk_import(scrape_csv(25), self.season, chunk_size=10), (25, 0))
+        self.assertEqual(sum(q["sql"].startswith('INSERT INTO "stats_game"') for q in ctx.captured_queries), 3)
+        self.assertEqual(queries.team_statistics().num_games, 25)
+        self.assertEqual(PlayerStat.objects.filter(is_mvp=True).count(), 50)
+
+    def test_memory(self):
+        # The file is streamed, so the memory used doesn't grow with its size
+        peaks = []
+        for num_games in (40, 160):
+            csv_file = scrape_csv(num_games)
+            tracemalloc.start()
+            try:
+                utils.bulk_import(csv_file, self.season, chunk_size=20)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        self.assertLess(peaks[1], 1.5 * peaks[0])
+
+    def test_reimport(self):
+        # Overlapping dumps only add the new games, with a single lookup per batch
+        self.assertEqual(utils.bulk_import(scrape_csv(10), self.season), (10, 0))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(utils.bulk_import(scrape_csv(10), self.season), (0, 10))
+        self.assertEqual(sum("stats_game" in q["sql"] for q in ctx.captured_queries), 1)
+        self.assertEqual(utils.bulk_import(scrape_csv(15), self.season), (5, 10))
+        self.assertEqual(Game.objects.count(), 15)
+        self.assertEqual(queries.team_statistics().num_games, 15)
+
+        # A game entered by hand is recognized too, whatever the order of its players
+        game = Game.objects.order_by("date").first()
+        players = list(game.playerstat_set.order_by("-pseudo"))
+        copy = Game.objects.create(date=game.date, season=self.season, is_won=True, score_allies=game.score_allies,
+                                   score_opponents=game.score_opponents)
+        for player in players:
+            player.pk, player.game = None, copy
+        PlayerStat.objects.bulk_create(players)
+        self.assertEqual(utils.update_fingerprints([copy]), [copy])
+        self.assertIsNone(Game.objects.get(pk=copy.pk).fingerprint)
+
+    def test_errors(self):
+        allies = ["Jejy", "Inconnu", "Leutik", "Helizen", "Renn_Kane"]
+        with self.assertRaises(utils.BulkImportError) as ctx:
+            utils.bulk_import(scrape_csv(2, allies=allies), self.season)
+        # The second player line of each game, after the header and the two team lines
+        self.assertEqual(ctx.exception.errors, [(5, "Inconnu n'est pas un teammate enregistré"),
+                                                (18, "Inconnu n'est pas un teammate enregistré")])
+        self.assertFalse(Game.objects.exists())
+
+        with self.assertRaisesRegex(utils.BulkImportError, "multiple of 14"):
+            utils.bulk_import(SimpleUploadedFile("dump.csv", b"header\nline\n"), self.season)
+
+
+class AliasTestCase(TestCase):
+    """
+    Tests for the resolution of the names of the Pokémon and of the teammates.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_resolve(self):
+        self.assertEqual(aliases.resolve(PokemonAlias.UNITEAPI, "MrMime"), "MR_MIME")  # Added by the migration
+        self.assertEqual(aliases.resolve(PokemonAlias.UNITEAPI, "ninetales"), "A_NINETALES")
+        self.assertEqual(aliases.resolve(PokemonAlias.UNITEAPI, "Pikachu"), "PIKACHU")
+        self.assertIsNone(aliases.resolve(PokemonAlias.UNITEAPI, "Pichu"))
+
+        # Loaded once
+        with self.assertNumQueries(0):
+            self.assertEqual(aliases.resolve(PokemonAlias.UNITEAPI, "a_ninetales"), "A_NINETALES")
+
+        # Reloaded after a change
+        with self.captureOnCommitCallbacks(execute=True):
+            PokemonAlias.objects.create(alias="Pika", pokemon_id="PIKACHU")
+        self.assertEqual(aliases.resolve(PokemonAlias.UNITEAPI, "pika"), "PIKACHU")
+        with self.captureOnCommitCallbacks(execute=True):
+            Pokemon.objects.create(id="PICHU", name="Pichu", category="A")
+        self.assertEqual(aliases.resolve(PokemonAlias.UNITEAPI, "Pichu"), "PICHU")
+
+    def test_teammates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for pseudo in ALLIES:
+                Teammate.objects.create(pseudo=pseudo)
+            TeammateAlias.objects.create(alias="FCS_RennKane", teammate_id="Renn_Kane")
+        self.assertEqual(aliases.resolve_teammate("FCS_RennKane"), "Renn_Kane")
+        self.assertEqual(aliases.resolve_teammate("Renn_Kane"), "Renn_Kane")
+        self.assertIsNone(aliases.resolve_teammate("FCS_Jejy"))
+        with self.captureOnCommitCallbacks(execute=True):
+            TeammateAlias.objects.create(alias="FCS_Jejy", teammate_id="Jejy")
+
+        # Aliases are replaced by the pseudo of the teammate, without any query per player
+        allies = ["FCS_Jejy", "AliceCheshir", "Leutik", "Helizen", "FCS_RennKane"]
+        season = Season.objects.create(number=1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(utils.bulk_import(scrape_csv(50, allies=allies), season), (50, 0))
+        self.assertLess(sum(q["sql"].startswith("SELECT") for q in ctx.captured_queries), 10)
+        self.assertEqual(PlayerStat.objects.filter(pseudo__in=["Jejy", "Renn_Kane"]).count(), 100)
+
+        stat = PlayerStat(game=Game.objects.first(), pseudo="FCS_Jejy", is_opponent=False)
+        with self.assertNumQueries(0):
+            stat.clean()
+        self.assertEqual(stat.pseudo, "Jejy")
+        stat.pseudo = "Inconnu"
+        with self.assertRaises(ValidationError):
+            stat.clean()
+
+
+class PrefillTestCase(TestCase):
+    """
+    Tests for the OCR of the result screenshots.
+    """
+
+    def setUp(self):
+        cache.clear()
+        Teammate.objects.create(pseudo="Renn_Kane")
+        TeammateAlias.objects.create(alias="FCS_RennKane", teammate_id="Renn_Kane")
+
+        self.screenshot = BytesIO()
+        Image.new("RGB", (1280, 720)).save(self.screenshot, format="PNG")
+        self.texts = {name: str(i) for i, name in enumerate(utils._prefill_boxes())}
+        self.texts |= {"ally_1": "FCS_RennKane", "opponent_2": "Mr Mime"}
+
+    @mock.patch("pyocr.tesseract.get_version", return_value=(5, 3, 0))  # No tesseract needed
+    def test_single_pass(self, get_version):
+        tool = FakeOcrTool(self.texts)
+        result, preview = utils.prefill_game(self.screenshot, ocr.OcrEngine(tool), single_pass=True)
+        self.assertEqual(tool.calls, 1)
+        self.assertEqual(result, self.texts | {"ally_1": "Renn_Kane"})
+        self.assertEqual(list(result), list(utils._prefill_boxes()))
+        self.assertTrue(preview)
+
+    @mock.patch("pyocr.tesseract.get_version", return_value=(5, 3, 0))  # No tesseract needed
+    def test_missed_boxes(self, get_version):
+        # The boxes the single pass missed are read one by one
+        del self.texts["ally_3_kills"], self.texts["opponent_score"]
+        tool = FakeOcrTool(self.texts)
+        result, _ = utils.prefill_game(self.screenshot, ocr.OcrEngine(tool), single_pass=True)
+        self.assertEqual(tool.calls, 3)
+        self.assertEqual((result["ally_3_kills"], result["opponent_score"], result["opponent_2"]),
+                         ("?", "?", "Mr Mime"))
+
+        tool = FakeOcrTool(self.texts)
+        result, _ = utils.prefill_game(self.screenshot, ocr.OcrEngine(tool, max_workers=4))
+        self.assertEqual(tool.calls, len(utils._prefill_boxes()))
+
+    @skipUnless(any(backend.is_available() for backend in ocr.BACKENDS), "Tesseract n'est pas installé")
+    def test_tesseract(self):
+        # Synthetic screenshot: light texts on a dark background, in the boxes of the result screen
+        texts = {name: str(i % 20) for i, name in enumerate(utils._prefill_boxes())}
+        texts |= {"ally_score": "412", "opponent_score": "187", "ally_1": "FCS_RennKane", "opponent_2": "Dracaufeu"}
+        texts |= {f"ally_{i}": pseudo for i, pseudo in enumerate(ALLIES[1:], 2)}
+        texts |= {f"opponent_{i}": f"Adversaire{i}" for i in (1, 3, 4, 5)}
+        img = Image.new("RGB", (1280, 720), (20, 30, 60))
+        draw = ImageDraw.Draw(img)
+        for name, bb in utils._prefill_boxes().items():
+            draw.text((bb[0] + 4, bb[1] + 2), texts[name], fill=(240, 240, 240),
+                      font=ImageFont.load_default(size=bb[3] - bb[1] - 8))
+        screenshot = BytesIO()
+        img.save(screenshot, format="PNG")
+
+        engine = ocr.get_engine()
+        timings = {}
+        results = {}
+        for single_pass in (False, True):
+            screenshot.seek(0)
+            began = time.perf_counter()
+            results[single_pass], _ = utils.prefill_game(screenshot, engine, single_pass=single_pass)
+            timings[single_pass] = time.perf_counter() - began
+
+        self.assertEqual(results[False]["ally_score"], "412")
+        self.assertEqual(results[False]["ally_1"], "Renn_Kane")
+        self.assertEqual(results[True], results[False])
+        ocr.logger.info("prefill_game with %s: %.0f ms per box, %.0f ms in a single pass", engine.tool.get_name(),
+                        1000 * timings[False], 1000 * timings[True])
+
+    def test_engine(self):
+        tool = FakeOcrTool(self.texts)
+        engine = ocr.OcrEngine(tool, max_workers=4)
+        self.assertEqual(engine.map(list(range(10))), [" ? "] * 10)
+        metrics = engine.metrics()
+        self.assertEqual((metrics["tool"], metrics["workers"], metrics["runs"]), ("Fake", 4, 10))
+        self.assertEqual((metrics["batches"], metrics["last_batch"][0]), (1, 10))
+
+    def test_admin_metrics(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        engine = ocr.OcrEngine(FakeOcrTool(self.texts), max_workers=2)
+        with mock.patch.object(ocr, "get_engine", return_value=engine):
+            self.assertContains(self.client.get(reverse("admin:stats_game_prefill")), "OCR : Fake, 2 threads")
+
+            self.screenshot.name = "screenshot.png"
+            self.screenshot.seek(0)
+            response = self.client.post(reverse("admin:stats_game_prefill"), {"picture": self.screenshot})
+            self.assertRedirects(response, reverse("admin:stats_game_add"), fetch_redirect_response=False)
+            response = self.client.get(reverse("admin:stats_game_prefill"))
+        self.assertContains(response, "Écran de résultat analysé en")
+        self.assertContains(response, "{} images reconnues".format(len(utils._prefill_boxes())))
+        self.assertContains(response, "Dernière analyse : {} images".format(len(utils._prefill_boxes())))
+
+    @mock.patch("pyocr.tesseract.get_version", return_value=(5, 3, 0))
+    def test_admin_single_pass(self, get_version):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        tool = FakeOcrTool(self.texts)
+        self.screenshot.name = "screenshot.png"
+        for single_pass, calls in ((False, len(utils._prefill_boxes())), (True, 1)):
+            tool.calls = 0
+            self.screenshot.seek(0)
+            with mock.patch.object(ocr, "get_engine", return_value=ocr.OcrEngine(tool)), \
+                    override_settings(OCR_SINGLE_PASS=single_pass):
+                self.client.post(reverse("admin:stats_game_prefill"), {"picture": self.screenshot})
+            self.assertEqual(tool.calls, calls)
+
+    def test_get_engine(self):
+        class Backend:
+            def __init__(self, name, available, languages):
+                self.name, self.available, self.languages = name, available, languages
+
+            def get_name(self):
+                return self.name
+
+            def is_available(self):
+                return self.available
+
+            def get_available_languages(self):
+                return self.languages
+
+        library, command = Backend("library", True, ["eng"]), Backend("command", True, ["eng"])
+        with mock.patch.object(ocr, "_engine", None), mock.patch.object(ocr, "BACKENDS", [library, command]):
+            engine = ocr.get_engine()
+            self.assertIs(engine.tool, library)
+            self.assertIs(ocr.get_engine(), engine)
+
+        library.available = False
+        with mock.patch.object(ocr, "_engine", None), mock.patch.object(ocr, "BACKENDS", [library, command]):
+            self.assertIs(ocr.get_engine().tool, command)
+
+        command.languages = ["fra"]
+        with mock.patch.object(ocr, "_engine", None), mock.patch.object(ocr, "BACKENDS", [library, command]):
+            with self.assertRaises(ocr.OcrUnavailable):
+                ocr.get_engine()
+
+
+class ImportJobTestCase(TestCase):
+    """
+    Tests for the background import jobs.
+    """
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+        self.season = Season.objects.create(number=1)
+        for pseudo in ALLIES:
+            Teammate.objects.create(pseudo=pseudo)
+        # The worker thread wouldn't see the data of the test transaction
+        self.wake = self.enterContext(mock.patch.object(jobs, "wake"))
+
+    def test_admin(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse("admin:stats_game_bulk_import"),
+                                        {"csv_file": scrape_csv(3), "season": self.season.pk})
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse("admin:stats_importjob_change", args=[job.pk]))
+        self.assertEqual(job.status, ImportJob.PENDING)
+        self.assertEqual(len(callbacks), 1)  # The worker is only woken up once the job is committed
+
+        # The page refreshes itself until the job is finished
+        response = self.client.get(reverse("admin:stats_importjob_change", args=[job.pk]))
+        self.assertContains(response, "En attente")
+        self.assertContains(response, 'http-equiv="refresh"')
+
+        jobs.process_pending()
+        response = self.client.get(reverse("admin:stats_importjob_change", args=[job.pk]))
+        self.assertContains(response, "3/3 validées, 3/3 importées")
+        self.assertNotContains(response, 'http-equiv="refresh"')
+
+    def test_queue(self):
+        first = ImportJob.objects.create(csv_file=scrape_csv(3), season=self.season)
+        allies = ["Jejy", "Inconnu", "Leutik", "Helizen", "Renn_Kane"]
+        second = ImportJob.objects.create(csv_file=scrape_csv(2, allies=allies), season=self.season)
+        jobs.process_pending()
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.num_games, first.num_parsed, first.num_inserted),
+                         (ImportJob.DONE, 3, 3, 3))
+        self.assertLessEqual(first.started_at, first.finished_at)
+
+        second.refresh_from_db()
+        self.assertEqual(second.status, ImportJob.FAILED)
+        self.assertEqual(second.errors, ["Ligne 5 : Inconnu n'est pas un teammate enregistré",
+                                         "Ligne 18 : Inconnu n'est pas un teammate enregistré"])
+        self.assertEqual(second.num_inserted, 0)
+        self.assertEqual(Game.objects.count(), 3)
+
+        # The files are deleted once imported
+        self.assertFalse(first.csv_file)
+        self.assertEqual(list(Path(settings.MEDIA_ROOT, "imports").iterdir()), [])
+
+    def test_recover(self):
+        # Left by a stopped process, no progress for too long, and a long import still saving its progress
+        now = datetime.now(timezone.utc)
+        stale = ImportJob.objects.create(csv_file=scrape_csv(3), season=self.season, status=ImportJob.RUNNING,
+                                         started_at=now - timedelta(minutes=20), updated_at=now - timedelta(minutes=15))
+        running = ImportJob.objects.create(csv_file=scrape_csv(2), season=self.season, status=ImportJob.RUNNING,
+                                           started_at=now - timedelta(hours=2), updated_at=now)
+        with self.assertLogs("stats.jobs", "WARNING"):
+            self.assertEqual(jobs.recover(), 1)
+        self.wake.assert_called_once()
+
+        jobs.process_pending()
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.num_inserted), (ImportJob.DONE, 3))
+        self.assertGreaterEqual(stale.updated_at, stale.started_at)  # Refreshed along the way
+        running.refresh_from_db()
+        self.assertEqual(running.status, ImportJob.RUNNING)
+
+        # Nothing left to do
+        self.wake.reset_mock()
+        self.assertEqual(jobs.recover(), 0)
+        self.wake.assert_not_called()
+
+
+class ImportScrapesTestCase(TestCase):
+    """
+    Tests for the import_scrapes command.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.season = Season.objects.create(number=1)
+        for pseudo in ALLIES:
+            Teammate.objects.create(pseudo=pseudo)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        # Overlapping exports, and one with an unknown teammate
+        for name, num_games, allies in (("a", 10, ALLIES), ("b", 15, ALLIES),
+                                        ("c", 2, ["Jejy", "Inconnu", "Leutik", "Helizen", "Renn_Kane"])):
+            (self.directory / f"{name}.csv").write_bytes(scrape_csv(num_games, allies=allies).read())
+
+    def import_scrapes(self, *args):
+        out = StringIO()
+        try:
+            call_command("import_scrapes", *args, season=1, workers=2, stdout=out)
+        except CommandError as e:
+            return out.getvalue(), str(e)
+        return out.getvalue(), None
+
+    def test_dry_run(self):
+        out, error = self.import_scrapes(self.directory, "--dry-run")
+        self.assertIn("25 valid games", out)
+        self.assertIn("15 to insert, 10 already present", out)
+        self.assertIn("Ligne 5 : Inconnu n'est pas un teammate enregistré", out)
+        self.assertEqual(error, "1 file(s) couldn't be imported")
+        self.assertFalse(Game.objects.exists())
+
+    def test_import(self):
+        out, error = self.import_scrapes(self.directory / "a.csv", self.directory / "b.csv", "--chunk-size", "4")
+        self.assertIn("15 inserted, 10 already present", out)
+        self.assertIsNone(error)
+        self.assertEqual(Game.objects.count(), 15)
+        self.assertEqual(queries.team_statistics().num_games, 15)
+
+        out, error = self.import_scrapes(self.directory / "b.csv")
+        self.assertIn("0 inserted, 15 already present", out)
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Tests that the queries of every page use an index, from the plan of each query given by EXPLAIN.
+    """
+
+    # Tables that don't grow with the number of games, a full scan of them is fine
+    SMALL_TABLES = {"stats_season", "stats_pokemon", "stats_teammate", "stats_gamerollup"}
+
+    def setUp(self):
+        cache.clear()
+        if connection.vendor not in ("sqlite", "postgresql"):
+            self.skipTest(f"No query plan parser for {connection.vendor}")
+
+    def full_scans(self, sql):
+        """
+        Get the tables fully scanned by a query.
+        """
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                details = [row[-1] for row in cursor.fetchall()]
+                # An index scan is reported as "SCAN table USING [COVERING] INDEX name"
+                return {m.group(2) for m in (re.match(r"SCAN (TABLE )?(\w+)( AS \w+)?$", d) for d in details) if m}
+
+            # The test tables are so small that PostgreSQL would scan them anyway
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scans = set()
+            nodes = [plan[0]["Plan"]]
+            while nodes:
+                node = nodes.pop()
+                if node["Node Type"] == "Seq Scan":
+                    scans.add(node["Relation Name"])
+                nodes += node.get("Plans", [])
+            return scans
+
+    def assertNoFullScan(self, url, params=None):
+        cache.clear()  # Every query has to run
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+
+        for query in ctx.captured_queries:
+            if query["sql"].startswith("SELECT"):
+                scans = self.full_scans(query["sql"]) - self.SMALL_TABLES
+                self.assertFalse(scans, f"Full scan of {', '.join(scans)} in {url} {params or ''}: {query['sql']}")
+
+    def test_pages(self):
+        games = create_games(5)
+        create_games(3, season=Season.objects.create(number=2), start=datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+        for params in ({}, {"season": 2}, {"exclude_bots": "on"}, {"page": 2, "per_page": 2}):
+            self.assertNoFullScan(reverse("games_list"), params)
+        self.assertNoFullScan(reverse("game_detail", kwargs={"game_id": games[0].pk}))
+        for params in ({}, {"season": 1}, {"exclude_bots": "on"}):
+            self.assertNoFullScan(reverse("team_stats"), params)
+            self.assertNoFullScan(reverse("player_detail", kwargs={"pseudo": "Jejy"}), params)
+        for params in ({}, {"season": 1, "window": "games"}, {"window": "days", "exclude_bots": "on"}):
+            self.assertNoFullScan(reverse("team_stats_chart"), params)
+            self.assertNoFullScan(reverse("player_chart", kwargs={"pseudo": "Jejy"}), params)
+
+    def test_api(self):
+        game = create_games(3)[0]
+
+        self.assertNoFullScan(reverse("api_games"), {"season": 1})
+        self.assertNoFullScan(reverse("api_game", kwargs={"game_id": game.pk}))
+        self.assertNoFullScan(reverse("api_team_stats"), {"window": "games"})
+        self.assertNoFullScan(reverse("api_player_stats", kwargs={"pseudo": "Jejy"}), {"season": 1})
+
+
+class InstrumentationTestCase(TestCase):
+    """
+    Tests for the per-request instrumentation middleware.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_logged_measures(self):
+        create_games(2)
+
+        with self.assertLogs("stats.requests", level="INFO") as logs:
+            response = self.client.get(reverse("games_list"))
+        props = logs.records[0].props
+        self.assertEqual(props["path"], reverse("games_list"))
+        self.assertEqual(props["status"], 200)
+        self.assertEqual(props["sql_queries"], 3)
+        self.assertGreater(props["template_time_ms"], 0)
+        self.assertGreaterEqual(props["total_time_ms"], props["db_time_ms"] + props["template_time_ms"])
+        self.assertNotIn("Server-Timing", response)
+
+    def test_staff_header(self):
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+
+        with self.assertLogs("stats.requests", level="INFO"):
+            response = self.client.get(reverse("team_stats"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[0-9.]+;desc="\d+ SQL", tpl;dur=[0-9.]+, total;dur=')
+
+
+class StatisticsCacheTestCase(TestCase):
+    """
+    Tests for the cache of the aggregated statistics.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def assertStatisticsCached(self):
+        create_games(4)
+        create_games(2, season=Season.objects.create(number=2), start=datetime(2024, 2, 1, tzinfo=timezone.utc))
+        stats_cache.reset_counters()
+
+        self.client.get(reverse("team_stats"))
+        with self.assertNumQueries(0):
+            statistics = queries.cached_team_statistics()
+        self.assertEqual(statistics.num_games, 6)
+        self.assertEqual(queries.cached_team_statistics(2).num_games, 2)  # Namespaced by season
+        self.assertEqual(stats_cache.get_counters()["team_statistics"], {"hits": 1, "misses": 2})
+
+        # Every write invalidates the statistics
+        PlayerStat.objects.filter(pseudo="Jejy").first().delete()
+        self.assertEqual(sum(ally.num_games for ally in queries.cached_team_statistics().per_ally), 29)
+        queries.cached_player_statistics("Jejy")
+        Teammate.objects.create(pseudo="Nouveau")
+        queries.cached_player_statistics("Jejy")
+        self.assertEqual(stats_cache.get_counters()["player_statistics"], {"hits": 0, "misses": 2})
+
+    def test_locmem_cache(self):
+        self.assertStatisticsCached()
+
+    def test_filesystem_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with override_settings(CACHES={"default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": cache_dir,
+            }}):
+                self.assertStatisticsCached()
+
+    def test_counters_in_memory(self):
+        create_games(1)
+        stats_cache.reset_counters()
+        stats_cache.flush_counters()
+        queries.cached_player_statistics("Jejy")
+
+        # A hit isn't written to the cache until the counters are flushed
+        with mock.patch.object(stats_cache, "cache", wraps=cache) as mock_cache:
+            queries.cached_player_statistics("Jejy")
+        mock_cache.set.assert_not_called()
+        mock_cache.incr.assert_not_called()
+        self.assertEqual(stats_cache.get_counters()["player_statistics"], {"hits": 1, "misses": 1})
+
+    def test_cache_stats_command(self):
+        create_games(1)
+        stats_cache.reset_counters()
+        queries.cached_player_statistics("Jejy")
+        queries.cached_player_statistics("Jejy")
+
+        out = StringIO()
+        call_command("cache_stats", "--reset", stdout=out)
+        self.assertIn("player_statistics", out.getvalue())
+        self.assertIn("50.0 %", out.getvalue())
+        self.assertEqual(stats_cache.get_counters()["player_statistics"], {"hits": 0, "misses": 0})
+
+
+class ApiTestCase(TestCase):
+    """
+    Tests for the JSON API.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_games(self):
+        create_games(3, season=Season.objects.create(number=1))
+        create_games(2, season=Season.objects.create(number=2), start=datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+        data = self.client.get(reverse("api_games"), {"season": 1, "per_page": 2}).json()
+        self.assertEqual([g["season"] for g in data["games"]], [1, 1])
+        self.assertEqual(len(data["games"][0]["teams"][0]["players"]), 5)
+        data = self.client.get(reverse("api_games"), {"season": 1, "per_page": 2, "after": data["next"]}).json()
+        self.assertEqual(len(data["games"]), 1)
+        self.assertIsNone(data["next"])
+
+    def test_statistics(self):
+        game = create_games(2)[0]
+
+        data = self.client.get(reverse("api_game", kwargs={"game_id": game.pk})).json()
+        self.assertEqual(data["id"], game.pk)
+        data = self.client.get(reverse("api_team_stats")).json()
+        self.assertEqual(data["num_games"], 2)
+        self.assertEqual(len(data["per_ally"]), 5)
+        data = self.client.get(reverse("api_player_stats", kwargs={"pseudo": "Jejy"}), {"window": "games"}).json()
+        self.assertEqual(data["totals"]["num_games"], 2)
+        self.assertEqual(len(data["moving_averages"]), 2)
+        self.assertEqual(self.client.get(reverse("api_player_stats", kwargs={"pseudo": "Nobody"})).status_code, 404)
+
+    def test_conditional_requests(self):
+        create_games(2)
+
+        response = self.client.get(reverse("api_team_stats"))
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("api_team_stats"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        PlayerStat.objects.filter(pseudo="Jejy").first().save()
+        response = self.client.get(reverse("api_team_stats"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
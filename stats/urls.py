@@ -1,9 +1,15 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.games_list, name="games_list"),
     path("game/<int:game_id>", views.game_detail, name="game_detail"),
     path("team_stats", views.team_stats, name="team_stats"),
-    path("player/<str:pseudo>", views.player_detail, name="player_detail")
+    path("team_stats/chart", views.team_stats_chart, name="team_stats_chart"),
+    path("player/<str:pseudo>", views.player_detail, name="player_detail"),
+    path("player/<str:pseudo>/chart", views.player_chart, name="player_chart"),
+    path("api/games", api.games, name="api_games"),
+    path("api/game/<int:game_id>", api.game, name="api_game"),
+    path("api/team_stats", api.team_stats, name="api_team_stats"),
+    path("api/player/<str:pseudo>", api.player_stats, name="api_player_stats"),
 ]
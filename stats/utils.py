@@ -3,60 +3,169 @@ Various helper functions.
 """
 
 import csv
+import hashlib
+import itertools
 import os
+import shutil
+import tempfile
 from io import BytesIO
 from base64 import b64encode
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from PIL import Image, ImageDraw, ImageEnhance, ImageOps
-from django.core.exceptions import ObjectDoesNotExist
+from pyocr.builders import WordBoxBuilder
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
-from stats.models import Game, PlayerStat, Pokemon, Teammate
+from django.db.models import Case, Prefetch, Value, When, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from stats import aliases, cache as stats_cache, rollups
+from stats.models import Game, PlayerStat, PokemonAlias
 
 
-def construct_game_context(game):
+def construct_games_context(games):
     """
-    Create a context item to be interpreted by game_detail_base.html. It adds data for each team in the 'teams' key, the
-    game's primary key in 'pk', as well as all the other Game fields.
+    Create the context items to be interpreted by game_detail_base.html for a whole list of games at once. Every player
+    stat (and its Pokémon) is retrieved in a single query, instead of one query per game and one query per player.
 
-    :param game: A Game object.
-    :return: A dict containing the context needed by the template.
+    :param games: An iterable of Game objects.
+    :return: A list of dicts containing the context needed by the template, in the same order as the games.
     """
 
-    player_stats = game.playerstat_set.all().order_by("pseudo")  # Retrieve each player stat
+    games = list(games)
+    prefetch_related_objects(
+        games,
+        Prefetch("playerstat_set", queryset=PlayerStat.objects.select_related("pokemon").order_by("pseudo"))
+    )
 
-    teams = [{}, {}]
+    return [_game_context(game, game.playerstat_set.all()) for game in games]
+
+
+def find_mvps(player_stats):
+    """
+    Find the MVP of each team of a game. The MVP is the player with the highest mark, or the highest scored points if
+    there's a draw.
+
+    :param player_stats: The player stats of the game sorted by pseudo, either as PlayerStat objects or as dicts.
+    :return: The player stats of the MVPs, one per team that has players.
+    """
 
-    teams[0]["score"] = game.score_allies
-    teams[1]["score"] = game.score_opponents
     mvp_vals = [0, 0]
     mvp_scores = [0, 0]
-    mvp_ids = [-1, -1]
+    mvps = [None, None]
+    last_players = [None, None]  # If nobody scored anything, the last player of the team is picked
 
-    idx = [0, 0]
     for stat in player_stats:
-        team_id = 1 if stat.is_opponent else 0
-        team = teams[team_id]
+        if isinstance(stat, dict):
+            is_opponent, result, scored = stat["is_opponent"], stat["result"], stat["scored"]
+        else:
+            is_opponent, result, scored = stat.is_opponent, stat.result, stat.scored
+        team_id = 1 if is_opponent else 0
+        last_players[team_id] = stat
 
-        stat_dict = {k: v for k, v in stat.__dict__.items() if not k.startswith("_")}
-        stat_dict["pokemon"] = stat.pokemon
-        stat_dict["is_mvp"] = False
+        if result > mvp_vals[team_id] or (result == mvp_vals[team_id] and scored > mvp_scores[team_id]):
+            mvp_vals[team_id] = result
+            mvp_scores[team_id] = scored
+            mvps[team_id] = stat
 
-        # MVP is the highest mark, or the highest scored points if there's a draw
-        if stat_dict["result"] > mvp_vals[team_id] \
-           or (stat_dict["result"] == mvp_vals[team_id] and stat_dict["scored"] > mvp_scores[team_id]):
-            mvp_vals[team_id] = stat_dict["result"]
-            mvp_scores[team_id] = stat_dict["scored"]
-            mvp_ids[team_id] = idx[team_id]
+    return [mvp if mvp is not None else last for mvp, last in zip(mvps, last_players) if last is not None]
+
+
+def update_mvp(games):
+    """
+    Compute and store the MVP flag of every player of the given games, with one query to read the player stats and
+    one query to update them.
+
+    :param games: An iterable of Game objects or primary keys.
+    :return: Number of player stats whose MVP flag changed.
+    """
+
+    game_ids = [getattr(game, "pk", game) for game in games]
+    player_stats = PlayerStat.objects.filter(game_id__in=game_ids).order_by("game_id", "pseudo").values(
+        "id", "game_id", "is_opponent", "result", "scored", "is_mvp"
+    )
+
+    per_game = {}
+    for stat in player_stats:
+        per_game.setdefault(stat["game_id"], []).append(stat)
+
+    mvp_ids = set()
+    changed_games = set()
+    num_changed = 0
+    for game_id, stats in per_game.items():
+        game_mvp_ids = {stat["id"] for stat in find_mvps(stats)}
+        mvp_ids |= game_mvp_ids
+        for stat in stats:
+            if stat["is_mvp"] != (stat["id"] in game_mvp_ids):
+                changed_games.add(game_id)
+                num_changed += 1
+
+    if changed_games:
+        PlayerStat.objects.filter(game_id__in=changed_games).update(
+            is_mvp=Case(When(id__in=mvp_ids, then=Value(True)), default=Value(False))
+        )
+        # update() doesn't send any signal
+        for game_id in changed_games:
+            stats_cache.bump_game_version(game_id)
+        stats_cache.bump_data_version()
+        rollups.refresh_games(changed_games)
+
+    return num_changed
+
+
+def render_game_cards(games):
+    """
+    Render the card of each game with game_detail_base.html. Cards are cached with the version of their game, so only
+    the games that changed since their last rendering have their context built and rendered again.
+
+    :param games: An iterable of Game objects.
+    :return: A list of rendered cards, in the same order as the games.
+    """
+
+    games = list(games)
+    versions = stats_cache.get_game_versions([game.pk for game in games])
+    cards = stats_cache.get_game_cards(versions)
+
+    missing = [game for game in games if game.pk not in cards]
+    if missing:
+        rendered = {
+            context["pk"]: render_to_string("stats/game_detail_base.html", {"game": context})
+            for context in construct_games_context(missing)
+        }
+        stats_cache.set_game_cards(rendered, versions)
+        cards |= rendered
+
+    return [mark_safe(cards[game.pk]) for game in games]
+
+
+def construct_game_context(game):
+    """
+    Create a context item to be interpreted by game_detail_base.html. It adds data for each team in the 'teams' key, the
+    game's primary key in 'pk', as well as all the other Game fields.
+
+    :param game: A Game object.
+    :return: A dict containing the context needed by the template.
+    """
+
+    return construct_games_context([game])[0]
 
-        if "players" in team:
-            team["players"].append(stat_dict)
-        else:
-            team["players"] = [stat_dict]
 
-        idx[team_id] += 1
+def _game_context(game, player_stats):
+    """
+    Build the context of a single game from its already retrieved player stats.
+
+    :param game: A Game object.
+    :param player_stats: The player stats of the game, sorted by pseudo, with their Pokémon already loaded.
+    :return: A dict containing the context needed by the template.
+    """
 
-    for i, team in enumerate(teams):
-        team["players"][mvp_ids[i]]["is_mvp"] = True
+    teams = [{"players": [], "score": game.score_allies}, {"players": [], "score": game.score_opponents}]
+
+    for stat in player_stats:
+        stat_dict = {k: v for k, v in stat.__dict__.items() if not k.startswith("_")}
+        stat_dict["pokemon"] = stat.pokemon
+        teams[1 if stat.is_opponent else 0]["players"].append(stat_dict)
 
     return {
         "teams": teams,
@@ -66,13 +175,15 @@ def construct_game_context(game):
     }
 
 
-def prefill_game(img, ocr_tool):
+# Region of the screenshot containing every text box, recognized at once in single pass mode
+RESULT_PANEL = (600, 50, 1260, 684)
+
+
+def _prefill_boxes():
     """
-    Get information about a game based on the screenshot of a game result.
+    Get the layout of the result screen.
 
-    :param img: The screenshot that will be parsed.
-    :param ocr_tool: The pyocr tool that will be used.
-    :return: A dict containing the pre-filled information, and a preview image showing the bounding boxes.
+    :return: A dict of (left, top, right, bottom) boxes of the screenshot indexed by name.
     """
 
     text_boxes = {
@@ -113,7 +224,44 @@ def prefill_game(img, ocr_tool):
         text_boxes["opponent_{}_total".format(i+1)] = (left_t, h,
                                                        left_t+tot_width, h+text_height)
 
-    result = {}
+    return text_boxes
+
+
+def _assign_words(word_boxes, text_boxes, offset):
+    """
+    Assign the words recognized on a part of the screenshot to the text boxes containing their center.
+
+    :param word_boxes: A list of pyocr Box objects, positioned relatively to the part of the screenshot.
+    :param text_boxes: Text boxes of the screenshot, as returned by _prefill_boxes.
+    :param offset: (left, top) position of the part in the screenshot.
+    :return: A dict of texts indexed by box name, the words of a box being joined from left to right.
+    """
+
+    words = {name: [] for name in text_boxes}
+    for word in word_boxes:
+        (left, top), (right, bottom) = word.position
+        x, y = offset[0] + (left + right) / 2, offset[1] + (top + bottom) / 2
+        for name, bb in text_boxes.items():
+            if bb[0] <= x < bb[2] and bb[1] <= y < bb[3]:
+                words[name].append((x, word.content))
+                break
+
+    return {name: " ".join(content for _, content in sorted(box_words)).strip() for name, box_words in words.items()}
+
+
+def prefill_game(img, ocr_engine, single_pass=False):
+    """
+    Get information about a game based on the screenshot of a game result.
+
+    :param img: The screenshot that will be parsed.
+    :param ocr_engine: The OcrEngine object that will be used.
+    :param single_pass: Whether to recognize the whole result panel at once and assign the words to the text boxes by
+        their position, instead of running the OCR on every text box (about 60 runs). The boxes left empty are then
+        read again one by one, in parallel. The admin enables it with the OCR_SINGLE_PASS setting.
+    :return: A dict containing the pre-filled information, and a preview image showing the bounding boxes.
+    """
+
+    text_boxes = _prefill_boxes()
 
     pil_img = Image.open(img).convert("L")
     pil_img = ImageOps.invert(pil_img)
@@ -123,14 +271,25 @@ def prefill_game(img, ocr_tool):
     draw = ImageDraw.Draw(preview)
     output = BytesIO()
 
-    for name, bb in text_boxes.items():
-        cropped = pil_img.crop(bb)
+    result = {name: "" for name in text_boxes}
+    if single_pass:
+        # Sparse text layout, since the panel is a table rather than paragraphs
+        word_boxes = ocr_engine.image_to_string(pil_img.crop(RESULT_PANEL), builder=WordBoxBuilder(tesseract_layout=11))
+        result |= _assign_words(word_boxes, text_boxes, RESULT_PANEL[:2])
+
+    missed = [name for name, text in result.items() if not text]
+    texts = ocr_engine.map([pil_img.crop(text_boxes[name]) for name in missed])
+    result |= {name: text.strip() for name, text in zip(missed, texts)}
 
+    for bb in text_boxes.values():
         draw.rectangle(bb, outline=(255, 0, 0))
 
-        result[name] = ocr_tool.image_to_string(cropped, lang="eng").strip()
+    # Replace the in-game names of the teammates with their pseudo
+    teammates = aliases.get_teammates()
+    for i in range(1, 6):
+        result[f"ally_{i}"] = teammates.get(result[f"ally_{i}"], result[f"ally_{i}"])
 
-    preview = preview.crop((600, 50, 1260, 684))
+    preview = preview.crop(RESULT_PANEL)
     preview.save(output, format='PNG')
     output.seek(0)
     preview_img = b64encode(output.read()).decode("ascii")
@@ -138,6 +297,52 @@ def prefill_game(img, ocr_tool):
     return result, preview_img
 
 
+def game_fingerprint(date, score_allies, score_opponents, players):
+    """
+    Compute the natural key of a game, so that the same game is never imported twice. The date is truncated to the
+    minute, which is the precision of the scraper dumps.
+
+    :param date: Date of the game.
+    :param score_allies: Score of the allies.
+    :param score_opponents: Score of the opponents.
+    :param players: An iterable of (pseudo, Pokémon ID, is opponent) tuples, in any order.
+    :return: A SHA-1 hex digest.
+    """
+
+    if timezone.is_aware(date):
+        date = date.astimezone(dt_timezone.utc)
+    key = [date.strftime("%Y-%m-%dT%H:%M"), score_allies, score_opponents,
+           sorted([pseudo, pokemon, bool(is_opponent)] for pseudo, pokemon, is_opponent in players)]
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def update_fingerprints(games):
+    """
+    Compute again the fingerprint of some games, e.g. after their players changed. A game whose fingerprint belongs to
+    another game is left without any.
+
+    :param games: An iterable of Game objects, with their players saved.
+    :return: The list of the games that duplicate another one.
+    """
+
+    games = list(games)
+    prefetch_related_objects(games, "playerstat_set")
+    for game in games:
+        game.fingerprint = game_fingerprint(game.date, game.score_allies, game.score_opponents, (
+            (p.pseudo, p.pokemon_id, p.is_opponent) for p in game.playerstat_set.all()
+        ))
+
+    known = set(Game.objects.filter(fingerprint__in=[game.fingerprint for game in games]).exclude(
+        pk__in=[game.pk for game in games]
+    ).values_list("fingerprint", flat=True))
+    duplicates = [game for game in games if game.fingerprint in known]
+    for game in duplicates:
+        game.fingerprint = None
+    Game.objects.bulk_update(games, ["fingerprint"])
+
+    return duplicates
+
+
 def chunked(seq, chunksize):
     """
     Yields items from an iterator in list chunks.
@@ -146,120 +351,324 @@ def chunked(seq, chunksize):
     :param chunksize: Size of a chunk.
     """
 
-    for pos in range(0, len(seq), chunksize):
-        yield seq[pos:pos + chunksize]
+    iterator = iter(seq)
+    while chunk := list(itertools.islice(iterator, chunksize)):
+        yield chunk
 
 
-@transaction.atomic
-def bulk_import(csv_file, season):
+class BulkImportError(ValueError):
+    """
+    Raised when a csv dump can't be imported. Every invalid line is reported at once.
     """
-    Bulk import a csv web scraper dump into database.
 
-    :param csv_file: An uploaded file that implements the .open() method.
-    :param season: Season number.
-    :return: Number of games added.
+    def __init__(self, errors):
+        """
+        :param errors: A list of (line number, message) tuples, the line number being None for the whole file.
+        """
+
+        self.errors = errors
+        self.messages = [f"Ligne {line} : {message}" if line else message for line, message in errors]
+        super().__init__("\n".join(self.messages))
+
+
+# Number of games inserted per INSERT query
+IMPORT_BATCH_SIZE = 200
+
+
+def _parse_player(row, pokemons):
+    """
+    Parse a player line of a scraper dump.
+
+    :return: A (pseudo, Pokémon ID, scored, kills, assists) tuple.
     """
 
-    # Dictionary of Pokémon DB IDs, indexed by their name
-    pokemons = {p.name.lower(): p.id for p in Pokemon.objects.all()}
+    try:
+        kills, assists, _ = (int(n) for n in row[5].split("|"))
+        scored = int(row[4])
+    except (IndexError, ValueError):
+        raise ValueError("statistiques du joueur invalides")
 
-    # Special cases, because uniteapi.dev doesn't have the same naming scheme as ours
-    pokemons["meowscara"] = pokemons.pop("meowscarada")
-    pokemons["ninetales"] = pokemons.pop("alolan ninetales")
-    pokemons["mewtwox"] = pokemons.pop("mewtwo x")
-    pokemons["mewtwoy"] = pokemons.pop("mewtwo y")
-    pokemons["urshifu_rapid"] = pokemons.pop("urshifu")
-    pokemons["urshifu_single"] = pokemons["urshifu_rapid"]
-    pokemons["mrmime"] = pokemons.pop("mr. mime")
+    # Try to identify the player's Pokémon based on the image url used in uniteapi.dev
+    pkm_img = row[9]
+    pkm_from_img = os.path.splitext(os.path.split(pkm_img)[1])[0].split("_")
+    pkm_from_img = "_".join(pkm_from_img[pkm_from_img.index("Square") + 1:] if "Square" in pkm_from_img else []).lower()
+    if pkm_from_img not in pokemons:
+        raise ValueError(f"No pokémon found in {pkm_img}")
 
-    # Load the csv into a list of rows
-    rows = []
-    with csv_file.open() as fp:
-        csv_reader = csv.reader((line.decode() for line in fp))
-        for row in csv_reader:
-            rows.append(row)
-    rows = rows[1:]  # Skip the header
+    return row[3], pokemons[pkm_from_img], scored, kills, assists
 
-    # 13 lines per game (2 for the result of each team, 10 player lines, and one empty line), + 1 for game metadata
-    if not (len(rows) / 14).is_integer():
-        raise ValueError("Line count should be a multiple of 14")
-    num_games = int(len(rows) / 14)
-    games_data = rows[:num_games * 13]
-    games_metadata = rows[num_games * 13:]
-
-    # Iterate over each game and create our objects
-    for metadata, data in zip(games_metadata, chunked(games_data, 13)):
+
+def _parse_game(metadata, data, season, pokemons, teammates):
+    """
+    Parse the lines of a game of a scraper dump.
+
+    :param metadata: The (line number, row) tuple of the game metadata.
+    :param data: The 13 (line number, row) tuples of the game results.
+    :param season: Season of the game.
+    :param pokemons: Pokémon IDs indexed by their name in uniteapi.dev, as returned by aliases.get_aliases.
+    :param teammates: Teammate pseudos indexed by every name of theirs, as returned by aliases.get_teammates.
+    :return: A (Game object, list of PlayerStat objects, list of (line number, message) errors) tuple, not saved yet.
+    """
+
+    errors = []
+    line, metadata = metadata
+    try:
         # Process general information about the game, and assert which team is which
         is_won = not metadata[6].lower().startswith("l")
         is_forfeit = bool(metadata[7])
-        team_a_won, team_a_score = data[0][2].split(" - ")
-        team_a_won = team_a_won.lower().startswith("v")
-        team_a_players = data[2:7]
-        team_b_won, team_b_score = data[1][2].split(" - ")
-        team_b_players = data[8:]
-
-        # Check which team has the same result as our team, which is known from is_won
-        if team_a_won == is_won:
-            allies_score = team_a_score
-            allies = team_a_players
-            opponents_score = team_b_score
-            opponents = team_b_players
-        else:
-            allies_score = team_b_score
-            allies = team_b_players
-            opponents_score = team_a_score
-            opponents = team_a_players
-
-        game = Game(
-            is_won=is_won,
-            is_forfeit=is_forfeit,
-            date=datetime.strptime(metadata[8], "%d-%m-%Y %H:%M"),
-            score_allies=allies_score,
-            score_opponents=opponents_score,
-            season=season
-        )
-        game.save()
+        date = datetime.strptime(metadata[8], "%d-%m-%Y %H:%M")
+    except (IndexError, ValueError):
+        return None, [], [(line, "métadonnées de la partie invalides")]
+    if settings.USE_TZ:
+        date = timezone.make_aware(date)
+
+    try:
+        team_a_won, team_a_score = data[0][1][2].split(" - ")
+        team_b_won, team_b_score = data[1][1][2].split(" - ")
+        team_a_score, team_b_score = int(team_a_score), int(team_b_score)
+    except (IndexError, ValueError):
+        return None, [], [(data[0][0], "scores des équipes invalides")]
+    team_a_won = team_a_won.lower().startswith("v")
+    team_a_players = data[2:7]
+    team_b_players = data[8:]
+
+    # Check which team has the same result as our team, which is known from is_won
+    if team_a_won == is_won:
+        allies_score, allies, opponents_score, opponents = team_a_score, team_a_players, team_b_score, team_b_players
+    else:
+        allies_score, allies, opponents_score, opponents = team_b_score, team_b_players, team_a_score, team_a_players
+
+    game = Game(
+        is_won=is_won,
+        is_forfeit=is_forfeit,
+        date=date,
+        score_allies=allies_score,
+        score_opponents=opponents_score,
+        season=season
+    )
+
+    players = []
+    for i, (line, row) in enumerate(allies + opponents):
+        is_ally = i < 5  # First five players are allies
+        try:
+            pseudo, pokemon, scored, kills, assists = _parse_player(row, pokemons)
+        except ValueError as e:
+            errors.append((line, str(e)))
+            continue
 
         # Give a unique name to bots
-        for i, p in enumerate(opponents):
-            if p[3] == "BOT":  # FIXME let's hope the player named "BOT" doesn't come back one day
-                p[3] = f"BOT_{i}"
-                # FIXME we should implement a way of formally identifying bots in database
-
-        # Process the PlayerStat entries associated with the current game
-        for i, p in enumerate(allies + opponents):
-            kills, assists, _ = (int(n) for n in p[5].split("|"))
-            scored = p[4]
-
-            # Try to identify the player's Pokémon based on the image url used in uniteapi.dev
-            pkm_img = p[9]
-            pkm_from_img = os.path.splitext(os.path.split(pkm_img)[1])[0].split("_")
-            pkm_from_img = "_".join(pkm_from_img[pkm_from_img.index("Square") + 1:]).lower()
-            try:
-                found_pkm = Pokemon.objects.get(id=pokemons[pkm_from_img])
-            except KeyError:
-                raise ValueError(f"No pokémon found in {pkm_img}")
-
-            # FIXME
-            player_name = "Renn_Kane" if p[3] == "FCS_RennKane" else "AliceCheshir" if p[3] == "FCS_Alice" else p[3]
-            is_ally = i < 5  # First five players are allies
-            if is_ally:  # Check that the ally is a teammate
-                try:
-                    Teammate.objects.get(pseudo=player_name)
-                except ObjectDoesNotExist:
-                    raise ValueError(f"{player_name} n'est pas un teammate enregistré")
-
-            ps = PlayerStat(
-                game=game,
-                pseudo=player_name,
-                is_opponent=not is_ally,
-                scored=scored,
-                kills=kills,
-                assists=assists,
-                result=0,
-                pokemon=found_pkm
-            )
-            print(ps)
-            ps.save()
-
-    return num_games
+        is_bot = not is_ally and pseudo == "BOT"  # FIXME let's hope the player named "BOT" doesn't come back one day
+        if is_bot:
+            pseudo = f"BOT_{i - 5}"
+
+        if is_ally:  # Check that the ally is a teammate, who may be named by one of their aliases
+            if pseudo in teammates:
+                pseudo = teammates[pseudo]
+            else:
+                errors.append((line, f"{pseudo} n'est pas un teammate enregistré"))
+        if any(p.pseudo == pseudo for p in players):
+            errors.append((line, f"{pseudo} apparaît deux fois dans la partie"))
+        if any(p.pokemon_id == pokemon and p.is_opponent != is_ally for p in players):
+            errors.append((line, f"{pokemon} apparaît deux fois dans la même équipe"))
+
+        players.append(PlayerStat(
+            pseudo=pseudo,
+            is_opponent=not is_ally,
+            is_bot=is_bot,
+            scored=scored,
+            kills=kills,
+            assists=assists,
+            result=0,
+            pokemon_id=pokemon,
+        ))
+
+    for stat in find_mvps(sorted(players, key=lambda p: p.pseudo)):
+        stat.is_mvp = True
+    game.fingerprint = game_fingerprint(date, allies_score, opponents_score,
+                                        ((p.pseudo, p.pokemon_id, p.is_opponent) for p in players))
+
+    return game, players, errors
+
+
+def _spool(csv_file):
+    """
+    Copy an uploaded file to an anonymous temporary file on disk, so that it can be read several times without being
+    held in memory.
+
+    :param csv_file: An uploaded file that implements the .open() method.
+    :return: A binary file object, to be closed by the caller.
+    """
+
+    spool = tempfile.TemporaryFile()
+    with csv_file.open() as fp:
+        shutil.copyfileobj(fp, spool)
+    return spool
+
+
+def _read_row(fp):
+    """
+    Parse the next line of a binary csv file, a scraper dump having exactly one record per line.
+    """
+
+    return next(csv.reader([fp.readline().decode()]), [])
+
+
+def _iter_games(fp, num_games):
+    """
+    Iterate over the games of a spooled scraper dump. The metadata lines come after every game block, so the file is
+    read from two positions at once, seeking from one to the other.
+
+    :param fp: Binary file object of the dump.
+    :param num_games: Number of games in the dump.
+    :return: A generator of (metadata, data) tuples, as expected by _parse_game.
+    """
+
+    fp.seek(0)
+    fp.readline()  # Skip the header
+    data_pos = fp.tell()
+    for _ in range(num_games * 13):
+        fp.readline()
+    metadata_pos = fp.tell()
+
+    for i in range(num_games):
+        fp.seek(data_pos)
+        data = [(2 + i * 13 + j, _read_row(fp)) for j in range(13)]
+        data_pos = fp.tell()
+        fp.seek(metadata_pos)
+        metadata = (2 + num_games * 13 + i, _read_row(fp))
+        metadata_pos = fp.tell()
+        yield metadata, data
+
+
+def load_scrape_names():
+    """
+    Get the names needed to parse scraper dumps, so that they are never queried per game.
+
+    :return: A (Pokémon IDs indexed by their name in uniteapi.dev, teammate pseudos indexed by their names) tuple.
+    """
+
+    return aliases.get_aliases(PokemonAlias.UNITEAPI), aliases.get_teammates()
+
+
+def count_dump_games(fp):
+    """
+    Count the games of a scraper dump.
+
+    :param fp: Binary file object of the dump, seekable.
+    :return: Number of games.
+    :raises BulkImportError: If the number of lines doesn't match a number of games.
+    """
+
+    # 13 lines per game (2 for the result of each team, 10 player lines, and one empty line), + 1 for game metadata
+    fp.seek(0)
+    num_lines = sum(1 for _ in fp) - 1  # Without the header
+    if num_lines % 14:
+        raise BulkImportError([(None, "Line count should be a multiple of 14")])
+    return num_lines // 14
+
+
+def parse_dump(fp, num_games, season, names):
+    """
+    Parse the games of a scraper dump one at a time.
+
+    :param fp: Binary file object of the dump, seekable.
+    :param num_games: Number of games in the dump, as returned by count_dump_games.
+    :param season: Season of the games.
+    :param names: Names returned by load_scrape_names.
+    :return: A generator of (Game object, list of PlayerStat objects, list of (line number, message) errors) tuples, the
+        objects not being saved.
+    """
+
+    pokemons, teammates = names
+    for metadata, data in _iter_games(fp, num_games):
+        yield _parse_game(metadata, data, season, pokemons, teammates)
+
+
+def insert_games(parsed, season):
+    """
+    Insert parsed games and their players in batches, then refresh what depends on them since bulk inserts don't send
+    any signal. The games already in database (or earlier in the same file) are skipped, based on their fingerprint.
+
+    :param parsed: An iterable of (Game object, list of PlayerStat objects) tuples, as returned by parse_dump.
+    :param season: Season of the games.
+    :return: A (number of games inserted, number of games skipped) tuple.
+    """
+
+    buckets = set()
+    num_inserted = num_skipped = 0
+    for batch in chunked(parsed, IMPORT_BATCH_SIZE):
+        # A single lookup per batch
+        known = set(Game.objects.filter(fingerprint__in=[game.fingerprint for game, _ in batch]).values_list(
+            "fingerprint", flat=True
+        ))
+        new = []
+        for game, players in batch:
+            if game.fingerprint not in known:
+                known.add(game.fingerprint)
+                new.append((game, players))
+        num_skipped += len(batch) - len(new)
+        if not new:
+            continue
+
+        games = Game.objects.bulk_create([game for game, _ in new])
+        num_inserted += len(games)
+        player_stats = []
+        for game, (_, players) in zip(games, new):
+            for player in players:
+                player.game = game
+            player_stats += players
+        PlayerStat.objects.bulk_create(player_stats)
+        buckets |= {rollups.game_bucket(game) for game in games}
+
+    if num_inserted:
+        rollups.refresh_buckets(buckets)
+        cache.delete_many([stats_cache.games_count_key(), stats_cache.games_count_key(season.pk)])
+        stats_cache.bump_data_version()
+
+    return num_inserted, num_skipped
+
+
+def bulk_import(csv_file, season, chunk_size=None, progress=None):
+    """
+    Bulk import a csv web scraper dump into database. The file is spooled to disk and streamed twice, with the Pokémon
+    and teammates loaded once: the first pass validates every game, the second one inserts them in batches. The memory
+    used doesn't depend on the size of the file.
+
+    :param csv_file: An uploaded file that implements the .open() method.
+    :param season: Season object.
+    :param chunk_size: Number of games committed per transaction, or None to import the whole file in a single
+        transaction. Invalid lines are always reported before anything is imported, but a database error in the middle
+        of the import keeps the chunks already committed.
+    :param progress: Callable called with the number of games in the file, validated, inserted and skipped, every time
+        they change: after every batch of validated games and every committed transaction.
+    :return: A (number of games added, number of games already present) tuple. Importing the same file twice doesn't
+        add anything the second time.
+    :raises BulkImportError: If the file is invalid, with every invalid line. Nothing is imported in that case.
+    """
+
+    names = load_scrape_names()
+
+    with _spool(csv_file) as fp:
+        num_games = count_dump_games(fp)
+        if progress:
+            progress(num_games, 0, 0, 0)
+
+        errors = []
+        for i, (_, _, game_errors) in enumerate(parse_dump(fp, num_games, season, names), start=1):
+            errors += game_errors
+            if progress and (i % IMPORT_BATCH_SIZE == 0 or i == num_games):
+                progress(num_games, i, 0, 0)
+        if errors:
+            raise BulkImportError(errors)
+
+        parsed = ((game, players) for game, players, _ in parse_dump(fp, num_games, season, names))
+        num_inserted = num_skipped = 0
+        for chunk in chunked(parsed, chunk_size) if chunk_size else [parsed]:
+            with transaction.atomic():
+                inserted, skipped = insert_games(chunk, season)
+            num_inserted += inserted
+            num_skipped += skipped
+            if progress:
+                progress(num_games, num_games, num_inserted, num_skipped)
+
+    return num_inserted, num_skipped
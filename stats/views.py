@@ -1,13 +1,74 @@
 from django.shortcuts import render
-from django.core.paginator import Paginator
-from django.db.models import Count, Avg, Sum, Case, Value, When, FloatField, DateField, IntegerField
-from django.db.models.functions import Cast, TruncDate
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
+from django.views.decorators.cache import cache_control
 
-from .models import Game, PlayerStat, Teammate
-from . import utils
+from .models import Game, Teammate
+from . import queries, utils
+from . import cache as stats_cache
+from .api import api_view
 from .forms import GamesListFilterForm, TeamStatFilterForm
+from .pagination import CachedCountPaginator, keyset_paginate
+
+
+AVG_NAMES = ("avg_scored", "avg_kills", "avg_assists", "avg_result")
+VERBOSE_NAMES = {
+    "avg_scored": "Score moyen",
+    "avg_kills": "Nombre moyen de kills",
+    "avg_assists": "Nombre moyen d'assists",
+    "avg_result": "Résultat moyen"
+}
+COLOR_VALUES = {
+    "avg_scored": "rgba(255,99,132,1)",
+    "avg_kills": "rgba(54, 162, 235, 1)",
+    "avg_assists": "rgba(255, 206, 86, 1)",
+    "avg_result": "rgba(75, 192, 192, 1)"
+}
+
+
+def _chart_series(moving_averages):
+    """
+    Build the series fetched by time_chart.html and integer_chart.html.
+
+    :param moving_averages: A list of MovingAverage objects.
+    :return: A JSON serializable dict with the labels and the Chart.js datasets.
+    """
+
+    return {
+        "labels": [point.key.isoformat() if hasattr(point.key, "isoformat") else str(point.key)
+                   for point in moving_averages],
+        "datasets": [
+            {
+                "label": VERBOSE_NAMES[name],
+                "data": [getattr(point, name) for point in moving_averages],
+                "borderColor": COLOR_VALUES[name],
+            } for name in AVG_NAMES
+        ] + [
+            {
+                "label": f"{VERBOSE_NAMES['avg_result']} ({label})",
+                "data": [getattr(point, split).avg_result for point in moving_averages],
+                "borderColor": COLOR_VALUES["avg_result"],
+                "borderDash": dash,
+                "spanGaps": True,
+            } for split, label, dash in (("won", "victoires", [6, 3]), ("lost", "défaites", [2, 2]))
+        ],
+    }
+
+
+def _stat_filters(request):
+    """
+    Validate the filters of the statistics pages.
+
+    :param request: Request object.
+    :return: A (season, window, window size, exclude bots) tuple.
+    """
+
+    if request.method == "GET":
+        filter_form = TeamStatFilterForm(request.GET)
+        filter_form.is_valid()
+        return (filter_form.cleaned_data.get("season") or None, filter_form.cleaned_data.get("window") or None,
+                filter_form.cleaned_data.get("window_size") or 10, filter_form.cleaned_data.get("exclude_bots", False))
+    return None, None, 10, False
 
 
 def games_list(request):
@@ -24,34 +85,49 @@ def games_list(request):
         filter_form.is_valid()
         items_per_page = filter_form.cleaned_data.get("per_page") or 10
         season_filter = filter_form.cleaned_data.get("season") or None
+        exclude_bots = filter_form.cleaned_data.get("exclude_bots", False)
     else:
         items_per_page = 10
         season_filter = None
+        exclude_bots = False
 
     url_get_encode = request.GET.copy()
-    if "page" in url_get_encode:
-        url_get_encode.pop("page")
+    for param in ("page", "after", "before"):
+        if param in url_get_encode:
+            url_get_encode.pop(param)
     url_get_encode = url_get_encode.urlencode()
 
     filter_form = GamesListFilterForm(initial={
         "per_page": items_per_page,
-        "season": season_filter
+        "season": season_filter,
+        "exclude_bots": exclude_bots,
     })
 
     if season_filter:
-        games = Game.objects.filter(season=season_filter).order_by("-date")
+        games = Game.objects.filter(season=season_filter)
     else:
-        games = Game.objects.all().order_by("-date")
-
-    paginator = Paginator(games, items_per_page)
-    games_paginated = paginator.get_page(page_number)
+        games = Game.objects.all()
+    if exclude_bots:
+        games = games.exclude(playerstat__is_bot=True)
+
+    if page_number:  # Legacy page number links, the total is cached to avoid counting every game on each page
+        paginator = CachedCountPaginator(games.order_by("-date", "-id"), items_per_page,
+                                         cache_key=stats_cache.games_count_key(season_filter and season_filter.pk,
+                                                                               exclude_bots))
+        games_paginated = paginator.get_page(page_number)
+    else:
+        games_paginated = keyset_paginate(games, items_per_page,
+                                          after=request.GET.get("after"), before=request.GET.get("before"))
 
-    games_info = [utils.construct_game_context(game) for game in games_paginated]
+    games_info = list(games_paginated)
+    for game, card in zip(games_info, utils.render_game_cards(games_info)):
+        game.card = card
 
     context = {
         "page_title": "Parties jouées",
         "games": games_info,
         "page_obj": games_paginated,  # This is needed for the paginator
+        "is_keyset": not page_number,
         "url_get_encode": url_get_encode,
         "filter_form": filter_form,
     }
@@ -68,10 +144,11 @@ def game_detail(request, game_id):
     """
 
     game = Game.objects.get(pk=game_id)
+    game.card = utils.render_game_cards([game])[0]
 
     context = {
         "page_title": str(game),
-        "game": utils.construct_game_context(game),
+        "game": game,
     }
 
     return render(request, "stats/game_detail.html", context)
@@ -84,116 +161,32 @@ def team_stats(request):
     :param request: Request object.
     """
 
-    if request.method == "GET":
-        filter_form = TeamStatFilterForm(request.GET)
-        filter_form.is_valid()
-        season_filter = filter_form.cleaned_data.get("season") or None
-    else:
-        season_filter = None
+    season_filter, window, window_size, exclude_bots = _stat_filters(request)
 
     url_get_encode = request.GET.urlencode()
 
     filter_form = TeamStatFilterForm(initial={
-        "season": season_filter
+        "season": season_filter,
+        "window": window,
+        "window_size": window_size,
+        "exclude_bots": exclude_bots,
     })
 
-    if season_filter:
-        games = Game.objects.filter(season=season_filter)
-        opponent_stats = PlayerStat.objects.filter(game_id__in=games.values('id'), is_opponent=True)
-        ally_stats = PlayerStat.objects.filter(game_id__in=games.values('id'), is_opponent=False)
-        avg_key = Cast(TruncDate("game__date"), output_field=DateField())
-        chart_type = "date"
-    else:
-        games = Game.objects.all()
-        opponent_stats = PlayerStat.objects.filter(is_opponent=True)
-        ally_stats = PlayerStat.objects.filter(is_opponent=False)
-        avg_key = Cast("game__season", output_field=IntegerField())
-        chart_type = "integer"
-
-    # Compute winrate
-    winrate = games.aggregate(
-        winrate=Avg(
-            Case(
-                When(is_won=True, then=Value(1)),
-                When(is_won=False, then=Value(0))
-            ),
-            output_field=FloatField()
-        )
-    )["winrate"]
-    num_games = len(games)
-
-    # Compute win-rate per opponent
-    per_opponent_winrate = opponent_stats.values("pokemon").annotate(
-        winrate=100*Sum(
-            Case(
-                When(game__is_won=True, then=Value(1))
-            ),
-            output_field=FloatField()
-        )/Cast(Count("pokemon"), FloatField()),
-        num_games=Count("id")
-    ).order_by("-winrate").exclude(winrate=None)
-
-    # Compute averages per teammate
-    per_ally_averages = ally_stats.values("pseudo").annotate(
-        avg_scored=Avg("scored"),
-        avg_kills=Avg("kills"),
-        avg_assists=Avg("assists"),
-        avg_result=Avg("result")
-    ).order_by("-avg_result", "-avg_scored")
-
-    # FIXME si un Pokémon n'a été rencontré dans aucun match gagné, il n'apparaît pas dans le taux par adversaire
-    # TODO refactoring
-
-    avg_names = ("avg_scored", "avg_kills", "avg_assists", "avg_result")
-    verbose_names = {
-        "avg_scored": "Score moyen",
-        "avg_kills": "Nombre moyen de kills",
-        "avg_assists": "Nombre moyen d'assists",
-        "avg_result": "Résultat moyen"
-    }
-
-    moving_averages = ally_stats.annotate(
-        avg_key=avg_key
-    ).values("avg_key").annotate(
-        avg_scored=Avg("scored"),
-        avg_kills=Avg("kills"),
-        avg_assists=Avg("assists"),
-        avg_result=Avg("result")
-    ).order_by("avg_key")
-
-    labels = []
-    datasets = {}
-    for point in moving_averages:
-        date_label = str(point["avg_key"])
-        labels.append(date_label)
-        for value_name in avg_names:
-            if value_name in datasets:
-                datasets[value_name].append(point[value_name])
-            else:
-                datasets[value_name] = [point[value_name]]
-
-    color_values = {
-        "avg_scored": "rgba(255,99,132,1)",
-        "avg_kills": "rgba(54, 162, 235, 1)",
-        "avg_assists": "rgba(255, 206, 86, 1)",
-        "avg_result": "rgba(75, 192, 192, 1)"
-    }
-
-    # END TODO
+    statistics = queries.cached_team_statistics(season_filter and season_filter.pk, exclude_bots)
 
+    # The chart series are fetched afterward by the chart script
     context = {
         "page_title": "Statistiques d'équipe",
-        "win_percentage": winrate*100 if winrate else None,
-        "num_games": num_games,
-        "per_opponent_winrate": per_opponent_winrate,
-        "per_ally_averages": per_ally_averages,
-        "labels": labels,
-        "datasets": datasets,
-        "verbose_names": verbose_names,
-        "color_values": color_values,
+        "win_percentage": statistics.winrate,
+        "num_games": statistics.num_games,
+        "per_opponent_winrate": statistics.per_opponent,
+        "per_ally_averages": statistics.per_ally,
         "url_get_encode": url_get_encode,
         "filter_form": filter_form,
-        "chart_type": chart_type,
+        "chart_type": "date" if season_filter or window else "integer",
+        "chart_url": reverse("team_stats_chart") + (f"?{url_get_encode}" if url_get_encode else ""),
+        "window": window,
+        "window_size": window_size,
     }
 
     return render(request, "stats/team_stats.html", context)
@@ -207,97 +200,80 @@ def player_detail(request, pseudo):
     :param pseudo: Player pseudo.
     """
 
-    # FIXME implement sliding window
     # FIXME see if possible to use a proper tag for GET parameters in templates
 
     if len(Teammate.objects.values("pseudo").filter(pseudo=pseudo)) == 0:
         return HttpResponseRedirect(reverse('games_list'))
 
-    if request.method == "GET":
-        filter_form = TeamStatFilterForm(request.GET)
-        filter_form.is_valid()
-        season_filter = filter_form.cleaned_data.get("season") or None
-    else:
-        season_filter = None
+    season_filter, window, window_size, exclude_bots = _stat_filters(request)
+
+    url_get_encode = request.GET.urlencode()
 
     filter_form = TeamStatFilterForm(initial={
-        "season": season_filter
+        "season": season_filter,
+        "window": window,
+        "window_size": window_size,
+        "exclude_bots": exclude_bots,
     })
 
-    if season_filter:
-        player_stats = PlayerStat.objects.filter(game__season=season_filter, is_opponent=False, pseudo=pseudo)
-        chart_type = "date"
-        avg_key = Cast(TruncDate("game__date"), output_field=DateField())
-    else:
-        player_stats = PlayerStat.objects.filter(is_opponent=False, pseudo=pseudo)
-        chart_type = "integer"
-        avg_key = Cast("game__season", output_field=IntegerField())
-
-    num_games = len(player_stats)
-
-    winrate = player_stats.aggregate(
-        winrate=Avg(
-            Case(
-                When(game__is_won=True, then=Value(1)),
-                When(game__is_won=False, then=Value(0))
-            ),
-            output_field=FloatField()
-        )
-    )["winrate"]
-
-    averages = player_stats.aggregate(
-        avg_scored=Avg("scored"),
-        avg_kills=Avg("kills"),
-        avg_assists=Avg("assists"),
-        avg_result=Avg("result")
-    )
-
-    avg_names = ("avg_scored", "avg_kills", "avg_assists", "avg_result")
-    verbose_names = {
-        "avg_scored": "Score moyen",
-        "avg_kills": "Nombre moyen de kills",
-        "avg_assists": "Nombre moyen d'assists",
-        "avg_result": "Résultat moyen"
-    }
-    moving_averages = player_stats.annotate(
-        avg_key=avg_key
-    ).values("avg_key").annotate(
-        avg_scored=Avg("scored"),
-        avg_kills=Avg("kills"),
-        avg_assists=Avg("assists"),
-        avg_result=Avg("result")
-    ).values("avg_key", *avg_names).order_by("avg_key")
-
-    labels = []
-    datasets = {}
-    for point in moving_averages:
-        date_label = str(point["avg_key"])
-        labels.append(date_label)
-        for value_name in avg_names:
-            if value_name in datasets:
-                datasets[value_name].append(point[value_name])
-            else:
-                datasets[value_name] = [point[value_name]]
-
-    color_values = {
-        "avg_scored": "rgba(255,99,132,1)",
-        "avg_kills": "rgba(54, 162, 235, 1)",
-        "avg_assists": "rgba(255, 206, 86, 1)",
-        "avg_result": "rgba(75, 192, 192, 1)"
-    }
+    statistics = queries.cached_player_statistics(pseudo, season_filter and season_filter.pk, exclude_bots)
 
     context = {
         "page_title": "Statistiques de {}".format(pseudo),
         "pseudo": pseudo,
-        "num_games": num_games,
-        "win_percentage": winrate * 100 if winrate else None,
-        "averages": averages,
-        "labels": labels,
-        "datasets": datasets,
-        "verbose_names": verbose_names,
-        "color_values": color_values,
+        "num_games": statistics.num_games,
+        "win_percentage": statistics.winrate,
+        "averages": statistics.totals,
+        "averages_split": [("Victoires", statistics.totals.won), ("Défaites", statistics.totals.lost)],
         "filter_form": filter_form,
-        "chart_type": chart_type,
+        "chart_type": "date" if season_filter or window else "integer",
+        "chart_url": reverse("player_chart", kwargs={"pseudo": pseudo})
+        + (f"?{url_get_encode}" if url_get_encode else ""),
+        "window": window,
+        "window_size": window_size,
     }
 
     return render(request, "stats/player_detail.html", context)
+
+
+@api_view
+@cache_control(no_cache=True)  # Revalidated with the ETag, so the chart is never older than the rest of the page
+def team_stats_chart(request):
+    """
+    Chart series of the team statistics page, as JSON.
+
+    :param request: Request object.
+    """
+
+    season_filter, window, window_size, exclude_bots = _stat_filters(request)
+    season = season_filter and season_filter.pk
+
+    if window:
+        moving_averages = queries.cached_sliding_averages(window, window_size, season=season,
+                                                          exclude_bots=exclude_bots)
+    else:
+        moving_averages = queries.cached_moving_averages(season=season, exclude_bots=exclude_bots)
+
+    return JsonResponse(_chart_series(moving_averages))
+
+
+@api_view
+@cache_control(no_cache=True)  # Revalidated with the ETag, so the chart is never older than the rest of the page
+def player_chart(request, pseudo):
+    """
+    Chart series of the player statistics page, as JSON.
+
+    :param request: Request object.
+    :param pseudo: Player pseudo.
+    """
+
+    season_filter, window, window_size, exclude_bots = _stat_filters(request)
+    season = season_filter and season_filter.pk
+
+    if window:
+        moving_averages = queries.cached_sliding_averages(window, window_size, pseudo=pseudo, season=season,
+                                                          exclude_bots=exclude_bots)
+    else:
+        moving_averages = queries.cached_moving_averages(pseudo, season, exclude_bots)
+
+    return JsonResponse(_chart_series(moving_averages))